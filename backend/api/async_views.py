@@ -0,0 +1,299 @@
+"""Асинхронные варианты самых частых GET-запросов.
+
+Подключаются в ``api.urls`` при ``ASYNC_READ_VIEWS = True`` и отдают
+те же данные, что RecipeViewSet, IngredientViewSet и copy_short_link,
+но работают с базой через асинхронный ORM, не занимая поток воркера.
+Прочие методы и запросы, которым нужны возможности DRF (``?format=``,
+браузерный API), передаются синхронным представлениям.
+"""
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from recipes import counters
+from recipes.models import Recipe
+from .caching import (
+    aget_cached_response_data,
+    aget_count,
+    aget_tables_version,
+    aset_cached_response_data,
+    get_recipes_cache_key,
+)
+from .conditional import (
+    aget_user_state,
+    get_last_modified,
+    get_not_modified_response,
+    make_etag,
+    set_conditional_headers,
+)
+from .filters import IngredientSearchFilter
+from .ingredient_index import ingredient_index
+from .pagination import Pagination
+from .serializers import RecipeSerializer
+from .views import (
+    IngredientViewSet,
+    RecipeViewSet,
+    copy_short_link,
+    get_recipes_queryset,
+)
+
+sync_recipe_list = RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+sync_recipe_detail = RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+sync_ingredient_list = IngredientViewSet.as_view({'get': 'list'})
+
+
+def json_response(data, status=200, allow=None):
+    response = HttpResponse(
+        JSONRenderer().render(data), status=status,
+        content_type='application/json'
+    )
+    if allow:
+        response['Allow'] = allow
+    return response
+
+
+def finalize(response):
+    # DRF добавляет Vary: Accept ко всем ответам
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def get_view(view_class, request, action):
+    """Экземпляр синхронного представления для его фильтров и настроек."""
+    return view_class(
+        request=request, action=action, args=(), kwargs={},
+        format_kwarg=None
+    )
+
+
+async def authenticate(request, view_class, allow):
+    """Аутентификация классами ``view_class``, как в APIView.initial.
+
+    Возвращает Request DRF с уже известным пользователем или ответ
+    с ошибкой аутентификации.
+    """
+    view = view_class()
+    drf_request = Request(request, authenticators=view.get_authenticators())
+    try:
+        # Аутентификаторы DRF обращаются к базе синхронно
+        await sync_to_async(getattr)(drf_request, 'user')
+    except exceptions.AuthenticationFailed as exc:
+        # Как APIView.handle_exception: 401 с WWW-Authenticate первого
+        # аутентификатора, если он его задает, иначе 403
+        header = view.get_authenticate_header(drf_request)
+        response = json_response(
+            {'detail': exc.detail}, 401 if header else 403, allow
+        )
+        if header:
+            response['WWW-Authenticate'] = header
+        return finalize(response)
+    return drf_request
+
+
+def is_async_request(request, allowed_params=None):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if 'format' in request.GET or 'text/html' in request.headers.get(
+        'Accept', ''
+    ):
+        return False
+    return allowed_params is None or set(request.GET) <= allowed_params
+
+
+async def filter_recipes(request, queryset):
+    """Фильтры RecipeViewSet.filter_backends.
+
+    Возвращает queryset или словарь ошибок. RecipeFilter проверяет
+    ``author`` запросом к базе, поэтому фильтры вызываются через
+    sync_to_async.
+    """
+    view = get_view(RecipeViewSet, request, 'list')
+    try:
+        return await sync_to_async(view.filter_queryset)(queryset)
+    except exceptions.ValidationError as exc:
+        return exc.detail
+
+
+async def get_state(request, queryset, counted=None):
+    # Как RecipeViewSet._conditional_response: для списка число строк
+    # из кэша get_count вместе с версиями таблиц. Запросы с курсором
+    # сюда не попадают, их ETag без COUNT строит RecipeViewSet.
+    if counted is None:
+        state = await queryset.aaggregate(
+            count=Count('id'), last_modified=Max('updated_at')
+        )
+    else:
+        state = await queryset.aaggregate(last_modified=Max('updated_at'))
+        state['count'] = (counted.count, counted.version)
+    etag = make_etag(
+        request, state['count'], state['last_modified'],
+        await aget_tables_version(counters.COUNTERS),
+        await aget_user_state(request.user)
+    )
+    last_modified = get_last_modified(
+        request, state['last_modified'], counted is None
+    )
+    return state['count'], last_modified, etag
+
+
+async def serialize_recipes(request, queryset):
+    if request.user.is_authenticated:
+        # Для UserSerializer.is_subscribed, см. get_following_ids
+        request._following_ids = {
+            pk async for pk in request.user.subscriptions.values_list(
+                'following_id', flat=True
+            )
+        }
+    recipes = [recipe async for recipe in queryset]
+    return RecipeSerializer(
+        recipes, many=True, context={'request': request}
+    ).data
+
+
+async def paginate(request, queryset, counted):
+    """Страница в формате Pagination без синхронных запросов.
+
+    Повторяет Pagination.paginate_queryset, но строки страницы читает
+    асинхронным ORM. Возвращает None для несуществующей страницы.
+    """
+    pagination = Pagination()
+    # Число строк уже получено для ETag, повторный COUNT не нужен
+    paginator = pagination.django_paginator_class(
+        queryset, pagination.get_page_size(request), counted=counted
+    )
+    try:
+        page = paginator.page(
+            pagination.get_page_number(request, paginator)
+        )
+    except InvalidPage:
+        return None
+    # Page.object_list - еще не выполненный срез queryset
+    page.object_list = await serialize_recipes(request, page.object_list)
+    pagination.request = request
+    pagination.page = page
+    return pagination.get_paginated_response(page.object_list).data
+
+
+@csrf_exempt
+async def recipe_list(request):
+    # Курсорная пагинация остается за RecipeViewSet
+    if not is_async_request(request) or (
+        Pagination.cursor_query_param in request.GET
+    ):
+        return await sync_to_async(sync_recipe_list)(request)
+    allow = 'GET, POST, HEAD, OPTIONS'
+    drf_request = await authenticate(request, RecipeViewSet, allow)
+    if isinstance(drf_request, HttpResponse):
+        return drf_request
+    queryset = await filter_recipes(drf_request, Recipe.objects.all())
+    if isinstance(queryset, dict):
+        return finalize(json_response(queryset, 400, allow))
+
+    counted = await aget_count(queryset)
+    _, last_modified, etag = await get_state(drf_request, queryset, counted)
+    response = get_not_modified_response(request, etag, last_modified)
+    if response is None:
+        key = get_recipes_cache_key(drf_request)
+        data = await aget_cached_response_data(key) if key else None
+        if data is None:
+            data = await paginate(
+                drf_request,
+                await filter_recipes(
+                    drf_request, get_recipes_queryset(drf_request.user)
+                ),
+                counted
+            )
+            if data is None:
+                return finalize(
+                    json_response({'detail': 'Invalid page.'}, 404, allow)
+                )
+            if key:
+                await aset_cached_response_data(key, data)
+        response = json_response(data, allow=allow)
+    set_conditional_headers(response, etag, last_modified)
+    return finalize(response)
+
+
+@csrf_exempt
+async def recipe_detail(request, pk):
+    if not is_async_request(request):
+        return await sync_to_async(sync_recipe_detail)(request, pk=pk)
+    allow = 'GET, PUT, PATCH, DELETE, HEAD, OPTIONS'
+    drf_request = await authenticate(request, RecipeViewSet, allow)
+    if isinstance(drf_request, HttpResponse):
+        return drf_request
+    count, last_modified, etag = await get_state(
+        drf_request, Recipe.objects.filter(pk=pk)
+    )
+    if not count:
+        return finalize(json_response(
+            {'detail': 'No Recipe matches the given query.'}, 404, allow
+        ))
+    response = get_not_modified_response(request, etag, last_modified)
+    if response is None:
+        key = get_recipes_cache_key(drf_request, pk)
+        data = await aget_cached_response_data(key) if key else None
+        if data is None:
+            data = (await serialize_recipes(
+                drf_request,
+                get_recipes_queryset(drf_request.user).filter(pk=pk)
+            ))[0]
+            if key:
+                await aset_cached_response_data(key, data)
+        response = json_response(data, allow=allow)
+    set_conditional_headers(response, etag, last_modified)
+    return finalize(response)
+
+
+@csrf_exempt
+async def ingredient_list(request):
+    search_param = IngredientSearchFilter.search_param
+    if not is_async_request(request, {search_param}):
+        return await sync_to_async(sync_ingredient_list)(request)
+    allow = 'GET, HEAD, OPTIONS'
+    drf_request = await authenticate(request, IngredientViewSet, allow)
+    if isinstance(drf_request, HttpResponse):
+        return drf_request
+    prefix = request.GET.get(search_param, '')
+    if ingredient_index.is_ready():
+        content, state = ingredient_index.search(prefix)
+    else:
+        # Построение индекса читает таблицу синхронным ORM
+        content, state = await sync_to_async(ingredient_index.search)(
+            prefix
+        )
+    etag = make_etag(drf_request, *state)
+    response = get_not_modified_response(request, etag)
+    if response is None:
+        response = HttpResponse(content, content_type='application/json')
+        response['Allow'] = allow
+    set_conditional_headers(response, etag)
+    return finalize(response)
+
+
+@csrf_exempt
+async def short_link(request, pk):
+    if not is_async_request(request):
+        return await sync_to_async(copy_short_link)(request, pk=pk)
+    allow = 'GET, OPTIONS'
+    drf_request = await authenticate(request, copy_short_link.cls, allow)
+    if isinstance(drf_request, HttpResponse):
+        return drf_request
+    if not await Recipe.objects.filter(pk=pk).aexists():
+        return finalize(json_response(
+            {'detail': 'No Recipe matches the given query.'}, 404, allow
+        ))
+    return finalize(json_response({
+        'short-link': request.build_absolute_uri(f'/recipes/{pk}/')
+    }, allow=allow))
@@ -0,0 +1,297 @@
+import hashlib
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+from recipes.models import COUNTER_FIELDS, Recipe
+from .constants import PAGE_SIZE
+
+RECIPES_VERSION_KEY = 'recipes:version'
+INGREDIENTS_VERSION_KEY = 'ingredients:version'
+COUNT_VERSION_KEY = 'count:version:{table}'
+CACHEABLE_PARAMS = {'page', 'limit', 'author', 'search', 'ordering'}
+# Для анонимного пользователя эти фильтры ничего не меняют
+IGNORED_PARAMS = {'is_favorited', 'is_in_shopping_cart'}
+
+
+def _get_version(key):
+    # Начальное значение берется из времени, чтобы после вытеснения
+    # счетчика из кэша не вернуться к уже использованной версии.
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def get_recipes_version():
+    return _get_version(RECIPES_VERSION_KEY)
+
+
+async def aget_recipes_version():
+    version = await cache.aget(RECIPES_VERSION_KEY)
+    if version is None:
+        await cache.aadd(RECIPES_VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(RECIPES_VERSION_KEY)
+    return version
+
+
+def bump_recipes_version():
+    _bump_version(RECIPES_VERSION_KEY)
+
+
+def get_ingredients_version():
+    return _get_version(INGREDIENTS_VERSION_KEY)
+
+
+def bump_ingredients_version():
+    _bump_version(INGREDIENTS_VERSION_KEY)
+
+
+def get_recipes_cache_key(request, pk=None):
+    """Ключ кэша для анонимного запроса списка или рецепта.
+
+    Возвращает None, если ответ кэшировать нельзя.
+    """
+    if request.user.is_authenticated:
+        return None
+    params = request.query_params
+    if set(params) - CACHEABLE_PARAMS - IGNORED_PARAMS:
+        return None
+    if pk is not None:
+        return f'recipes:detail:{request.get_host()}:{pk}'
+    return (
+        'recipes:list:{host}:{page}:{limit}:{author}:{ordering}:{search}'
+    ).format(
+        host=request.get_host(),
+        page=params.get('page', '1').strip(),
+        limit=params.get('limit', str(PAGE_SIZE)).strip(),
+        author=params.get('author', '').strip(),
+        ordering=params.get('ordering', '').strip(),
+        search=hashlib.md5(
+            params.get('search', '').strip().encode()
+        ).hexdigest(),
+    )
+
+
+def _cached_recipes(data):
+    # Страница списка или один рецепт
+    return data.get('results', [data])
+
+
+def _counters_queryset(recipes):
+    return Recipe.objects.filter(
+        pk__in=[recipe['id'] for recipe in recipes]
+    ).values_list('pk', *COUNTER_FIELDS)
+
+
+def _apply_counters(recipes, rows):
+    counters = {pk: values for pk, *values in rows}
+    for recipe in recipes:
+        if recipe['id'] in counters:
+            recipe.update(zip(COUNTER_FIELDS, counters[recipe['id']]))
+
+
+def get_cached_response_data(key):
+    """Закэшированный ответ с текущими счетчиками рецептов.
+
+    Счетчики избранного и корзин меняются чаще остальных данных, поэтому
+    не сбрасывают кэш, а читаются одним запросом по первичным ключам.
+    """
+    data = cache.get(key, version=get_recipes_version())
+    if data is not None:
+        recipes = _cached_recipes(data)
+        if recipes:
+            _apply_counters(recipes, _counters_queryset(recipes))
+    return data
+
+
+def set_cached_response_data(key, data):
+    cache.set(
+        key, data, settings.RECIPES_CACHE_TIMEOUT,
+        version=get_recipes_version()
+    )
+
+
+async def aget_cached_response_data(key):
+    data = await cache.aget(key, version=await aget_recipes_version())
+    if data is not None:
+        recipes = _cached_recipes(data)
+        if recipes:
+            _apply_counters(recipes, [
+                row async for row in _counters_queryset(recipes)
+            ])
+    return data
+
+
+async def aset_cached_response_data(key, data):
+    await cache.aset(
+        key, data, settings.RECIPES_CACHE_TIMEOUT,
+        version=await aget_recipes_version()
+    )
+
+
+# count: число строк; exact: False для оценки по статистике PostgreSQL;
+# version: версии таблиц запроса, меняются при создании и удалении строк
+CountResult = namedtuple('CountResult', ('count', 'exact', 'version'))
+
+
+def bump_count_version(table):
+    key = COUNT_VERSION_KEY.format(table=table)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _count_tables(queryset):
+    query = queryset.query
+    return sorted({
+        query.model._meta.db_table,
+        *(join.table_name for join in query.alias_map.values()),
+    })
+
+
+def _count_signature(queryset):
+    """Ключ запроса COUNT или None, если запрос заведомо пуст.
+
+    Строится по SQL из одного первичного ключа, поэтому не зависит от
+    сортировки, аннотаций и select_related: queryset для ETag и для
+    страницы дают один и тот же ключ.
+    """
+    try:
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    except EmptyResultSet:
+        return None
+    return hashlib.md5(repr((sql, params)).encode()).hexdigest()
+
+
+def _is_unfiltered(queryset):
+    query = queryset.query
+    return not (query.where or query.distinct or query.is_sliced)
+
+
+def estimate_count(queryset):
+    """Оценка числа строк таблицы по pg_class.reltuples."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(queryset.model._meta.db_table)]
+        )
+        row = cursor.fetchone()
+    # -1, если таблицу еще не анализировали
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def _count_version_keys(queryset):
+    return [
+        COUNT_VERSION_KEY.format(table=table)
+        for table in _count_tables(queryset)
+    ]
+
+
+def _get_count_version(keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        versions.update(cache.get_many(missing))
+    return tuple(versions.get(key) for key in keys)
+
+
+async def _aget_count_version(keys):
+    versions = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            await cache.aadd(key, time.time_ns(), None)
+        versions.update(await cache.aget_many(missing))
+    return tuple(versions.get(key) for key in keys)
+
+
+def get_tables_version(models):
+    """Версии таблиц ``models``, меняются при создании и удалении строк."""
+    return _get_count_version([
+        COUNT_VERSION_KEY.format(table=model._meta.db_table)
+        for model in models
+    ])
+
+
+async def aget_tables_version(models):
+    return await _aget_count_version([
+        COUNT_VERSION_KEY.format(table=model._meta.db_table)
+        for model in models
+    ])
+
+
+def get_queryset_version(queryset):
+    """Версии таблиц queryset, как в ``get_count``, но без подсчета."""
+    return _get_count_version(_count_version_keys(queryset))
+
+
+def _count_key(signature, version):
+    return f'count:{signature}:' + '.'.join(map(str, version))
+
+
+def get_count(queryset):
+    """Число строк queryset из кэша или оценки статистики.
+
+    Точное значение кэшируется по SQL запроса и версиям его таблиц
+    на ``PAGINATION_COUNT_CACHE_TIMEOUT``; для таблицы без фильтров
+    больше ``PAGINATION_ESTIMATE_THRESHOLD`` строк берется оценка.
+    """
+    version = _get_count_version(_count_version_keys(queryset))
+    if _is_unfiltered(queryset):
+        estimate = estimate_count(queryset)
+        if estimate is not None and estimate >= (
+            settings.PAGINATION_ESTIMATE_THRESHOLD
+        ):
+            return CountResult(estimate, False, version)
+    signature = _count_signature(queryset)
+    if signature is None:
+        return CountResult(0, True, version)
+    key = _count_key(signature, version)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return CountResult(count, True, version)
+
+
+async def aget_count(queryset):
+    version = await _aget_count_version(_count_version_keys(queryset))
+    if _is_unfiltered(queryset):
+        estimate = await sync_to_async(estimate_count)(queryset)
+        if estimate is not None and estimate >= (
+            settings.PAGINATION_ESTIMATE_THRESHOLD
+        ):
+            return CountResult(estimate, False, version)
+    signature = _count_signature(queryset)
+    if signature is None:
+        return CountResult(0, True, version)
+    key = _count_key(signature, version)
+    count = await cache.aget(key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(
+            key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        )
+    return CountResult(count, True, version)
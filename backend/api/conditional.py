@@ -0,0 +1,81 @@
+import hashlib
+
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription, User
+
+
+def _user_aggregate(model, aggregate):
+    return Subquery(
+        model.objects.filter(user=OuterRef('pk'))
+        .order_by()
+        .values('user')
+        .annotate(value=aggregate('id'))
+        .values('value'),
+        output_field=IntegerField()
+    )
+
+
+def _user_state_queryset(user):
+    # Количество и последний id избранного, корзины и подписок
+    # меняются при любом изменении флагов is_favorited,
+    # is_in_shopping_cart и is_subscribed в ответе.
+    return User.objects.filter(pk=user.pk).values_list(
+        _user_aggregate(Favorite, Count),
+        _user_aggregate(Favorite, Max),
+        _user_aggregate(ShoppingCart, Count),
+        _user_aggregate(ShoppingCart, Max),
+        _user_aggregate(Subscription, Count),
+        _user_aggregate(Subscription, Max),
+    )
+
+
+def get_user_state(user):
+    if not user.is_authenticated:
+        return None
+    return _user_state_queryset(user).first()
+
+
+async def aget_user_state(user):
+    if not user.is_authenticated:
+        return None
+    return await _user_state_queryset(user).afirst()
+
+
+def make_etag(request, *state):
+    digest = hashlib.sha256(repr((
+        request.get_host(),
+        request.get_full_path(),
+        request.user.pk,
+        state,
+    )).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def get_last_modified(request, last_modified, detail):
+    """Max(updated_at) годится для Last-Modified только у анонимной
+    карточки рецепта: он не меняется при удалении рецептов из списка
+    и при изменении избранного, корзины и подписок пользователя.
+    Остальные ответы проверяются только по ETag.
+    """
+    if detail and not request.user.is_authenticated:
+        return last_modified
+    return None
+
+
+def get_not_modified_response(request, etag, last_modified=None):
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+
+
+def set_conditional_headers(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_vary_headers(response, ('Authorization',))
+    return response
@@ -10,4 +10,6 @@ MIN_INGREDIENT_AMOUNT = 1
 MIN_COOKING_TIME = 1
 
 MIN_AMOUNT = 1
-PAGE_SIZE = 6 
\ No newline at end of file
+PAGE_SIZE = 6
+
+SEARCH_CONFIG = 'russian'
@@ -0,0 +1,175 @@
+import base64
+import binascii
+import re
+import uuid
+from contextlib import ExitStack
+from tempfile import SpooledTemporaryFile
+from typing import ClassVar
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+
+# Сигнатуры в начале файла: формат, MIME-тип, расширение
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG', 'image/jpeg', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG', 'image/png', 'png'),
+    (b'GIF87a', 'GIF', 'image/gif', 'gif'),
+    (b'GIF89a', 'GIF', 'image/gif', 'gif'),
+)
+# Pillow называет JPEG с дополнительными кадрами (снимки с телефонов)
+# форматом MPO, для проверки сигнатуры это тот же JPEG
+PIL_FORMATS = {'MPO': 'JPEG'}
+HEADER_SIZE = 12
+BASE64_MARKER = ';base64,'
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s+')
+
+
+def detect_format(header):
+    for signature, image_format, content_type, extension in SIGNATURES:
+        if header.startswith(signature):
+            return image_format, content_type, extension
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP', 'image/webp', 'webp'
+    return None
+
+
+class Base64ImageField(serializers.ImageField):
+    """Картинка в base64, декодируемая по частям во временный файл.
+
+    Файл держится в памяти до ``FILE_UPLOAD_MAX_MEMORY_SIZE``, затем
+    сбрасывается на диск. Размер проверяется по длине base64 до
+    декодирования, формат по сигнатуре, а размеры в пикселях по
+    заголовку, как только он прочитан, без декодирования пикселей.
+    """
+
+    default_error_messages: ClassVar[dict] = {
+        'invalid': 'Загрузите картинку в формате base64.',
+        'invalid_image': 'Загрузите корректную картинку.',
+        'invalid_format': 'Поддерживаются только JPEG, PNG, GIF и WebP.',
+        'too_large': 'Размер картинки не должен превышать {max_size} байт.',
+        'too_many_pixels': (
+            'Картинка не должна быть больше {max_dimension} пикселей '
+            'по стороне и {max_pixels} пикселей всего.'
+        ),
+        'empty': 'Загруженный файл пуст.',
+    }
+
+    def __init__(self, *, max_size=None, max_dimension=None, max_pixels=None,
+                 **kwargs):
+        self.max_size = max_size or settings.IMAGE_UPLOAD_MAX_SIZE
+        self.max_dimension = (
+            max_dimension or settings.IMAGE_UPLOAD_MAX_DIMENSION
+        )
+        self.max_pixels = max_pixels or settings.IMAGE_UPLOAD_MAX_PIXELS
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if data in (None, ''):
+            return None
+        if not isinstance(data, str):
+            self.fail('invalid')
+        # Строка не копируется: данные читаются срезами после заголовка
+        offset = data.find(BASE64_MARKER)
+        offset = 0 if offset < 0 else offset + len(BASE64_MARKER)
+        # Оценка сверху: пробелы и выравнивание только уменьшают размер
+        if (len(data) - offset) * 3 // 4 > self.max_size + 2:
+            self.fail('too_large', max_size=self.max_size)
+
+        with ExitStack() as stack:
+            file = stack.enter_context(SpooledTemporaryFile(
+                max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+            ))
+            size, image_format = self._decode(data, offset, file)
+            if not size:
+                self.fail('empty')
+            if size > self.max_size:
+                self.fail('too_large', max_size=self.max_size)
+            file.seek(0)
+            try:
+                image = Image.open(file)
+                self._check_dimensions(image)
+                pil_format = PIL_FORMATS.get(image.format, image.format)
+                if pil_format != image_format[0]:
+                    self.fail('invalid_format')
+                # verify проверяет структуру файла без декодирования
+                image.verify()
+            except Image.DecompressionBombError:
+                self._fail_dimensions()
+            except (UnidentifiedImageError, OSError, SyntaxError,
+                    ValueError):
+                self.fail('invalid_image')
+            # Проверки пройдены, файл остается открытым для UploadedFile
+            stack.pop_all()
+        file.seek(0)
+        _, content_type, extension = image_format
+        return UploadedFile(
+            file, name=f'{uuid.uuid4()}.{extension}',
+            content_type=content_type, size=size
+        )
+
+    def _decode(self, data, offset, file):
+        size = 0
+        image_format = None
+        header_checked = False
+        rest = ''
+        for start in range(offset, len(data), CHUNK_SIZE):
+            chunk = rest + WHITESPACE.sub(
+                '', data[start:start + CHUNK_SIZE]
+            )
+            # Хвост, не кратный 4, переносится в следующий кусок
+            cut = len(chunk) - len(chunk) % 4
+            chunk, rest = chunk[:cut], chunk[cut:]
+            try:
+                decoded = base64.b64decode(chunk, validate=True)
+            except (binascii.Error, ValueError):
+                self.fail('invalid')
+            file.write(decoded)
+            size += len(decoded)
+            if size > self.max_size:
+                self.fail('too_large', max_size=self.max_size)
+            if image_format is None and size >= HEADER_SIZE:
+                file.seek(0)
+                image_format = detect_format(file.read(HEADER_SIZE))
+                if image_format is None:
+                    self.fail('invalid_format')
+                file.seek(0, 2)
+            if image_format is not None and not header_checked:
+                header_checked = self._try_header(file)
+        if rest:
+            self.fail('invalid')
+        if size and image_format is None:
+            self.fail('invalid_format')
+        return size, image_format
+
+    def _try_header(self, file):
+        # Заголовок может оказаться дальше уже прочитанной части,
+        # тогда проверка повторится после следующего куска
+        file.seek(0)
+        try:
+            image = Image.open(file)
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            image = None
+        except Image.DecompressionBombError:
+            self._fail_dimensions()
+        file.seek(0, 2)
+        if image is None:
+            return False
+        self._check_dimensions(image)
+        return True
+
+    def _check_dimensions(self, image):
+        width, height = image.size
+        if (
+            max(width, height) > self.max_dimension
+            or width * height > self.max_pixels
+        ):
+            self._fail_dimensions()
+
+    def _fail_dimensions(self):
+        self.fail(
+            'too_many_pixels', max_dimension=self.max_dimension,
+            max_pixels=self.max_pixels
+        )
@@ -1,13 +1,79 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django_filters import rest_framework as filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import (
+    BaseFilterBackend,
+    OrderingFilter,
+    SearchFilter,
+)
 
 from recipes.models import Recipe
+from .constants import SEARCH_CONFIG
 
 
 class IngredientSearchFilter(SearchFilter):
     search_param = 'name'
 
 
+class TextSearchFilter(BaseFilterBackend):
+    """Поиск по подстроке с учетом опечаток в параметре ``search``.
+
+    В PostgreSQL ищет по триграммам поля ``view.trigram_search_field``
+    и по ``view.search_vector_field``, если оно задано, и сортирует
+    по релевантности. В остальных СУБД выполняет ``icontains``
+    по ``view.text_search_fields``.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            condition = Q()
+            for field in view.text_search_fields:
+                condition |= Q(**{f'{field}__icontains': query})
+            return queryset.filter(condition)
+
+        field = view.trigram_search_field
+        condition = (
+            Q(**{f'{field}__icontains': query})
+            | Q(**{f'{field}__trigram_similar': query})
+        )
+        rank = TrigramSimilarity(field, query)
+        vector_field = getattr(view, 'search_vector_field', None)
+        if vector_field:
+            search_query = SearchQuery(
+                query, config=SEARCH_CONFIG, search_type='websearch'
+            )
+            condition |= Q(**{vector_field: search_query})
+            rank = Greatest(rank, SearchRank(F(vector_field), search_query))
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        return queryset.filter(condition).annotate(
+            search_rank=rank
+        ).order_by('-search_rank', *ordering)
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Сортировка по ``?ordering=``, например ``-favorites_count``.
+
+    К выбранным полям добавляется ``id``, чтобы порядок рецептов
+    с одинаковыми значениями не менялся между страницами.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering = (*ordering, 'id')
+        return ordering
+
+
 class RecipeFilter(filters.FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
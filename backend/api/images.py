@@ -0,0 +1,194 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from recipes.models import Recipe
+from users.models import User
+from .caching import bump_recipes_version
+
+logger = logging.getLogger(__name__)
+
+# Наибольшая сторона каждого варианта; меньшие картинки не растягиваются
+RECIPE_VARIANTS = {'thumbnail': 160, 'card': 480, 'full': 1280}
+AVATAR_VARIANTS = {'thumbnail': 64, 'card': 256}
+FORMATS = {
+    'avif': ('AVIF', {'quality': 60}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+VARIANTS_DIR = 'variants'
+# Ошибки чтения и кодирования картинки, хранилища и записи в БД;
+# остальные исключения означают ошибку в коде и не перехватываются
+PROCESSING_ERRORS = (
+    OSError, ValueError, SyntaxError, Image.DecompressionBombError,
+    DatabaseError,
+)
+
+_executor = None
+# Включается run_synchronously()
+_synchronous = ContextVar('image_processing_synchronous', default=False)
+
+
+def get_formats():
+    # AVIF есть не во всех сборках Pillow
+    return [
+        name for name in settings.IMAGE_VARIANT_FORMATS
+        if name in FORMATS and (name != 'avif' or features.check('avif'))
+    ]
+
+
+def _encode(image, file_format):
+    pil_format, options = FORMATS[file_format]
+    if file_format == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if 'A' in image.getbands():
+            background.paste(image, mask=image.getchannel('A'))
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+    buffer = io.BytesIO()
+    # Метаданные (EXIF, ICC, XMP) не передаются в save и не сохраняются
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_variants(storage, name, sizes):
+    """Создает уменьшенные копии картинки ``name`` во всех форматах.
+
+    Имена файлов строятся из SHA-256 содержимого, поэтому одинаковые
+    варианты хранятся один раз. Возвращает
+    ``{'source': name, вариант: {формат: имя файла}}``.
+    """
+    with storage.open(name, 'rb') as file:
+        source = Image.open(file)
+        source.load()
+    source = ImageOps.exif_transpose(source)
+    if source.mode not in ('RGB', 'RGBA'):
+        has_alpha = (
+            'A' in source.getbands() or 'transparency' in source.info
+        )
+        source = source.convert('RGBA' if has_alpha else 'RGB')
+    variants = {'source': name}
+    for variant, size in sizes.items():
+        image = source.copy()
+        image.info = {}
+        image.thumbnail((size, size), Image.LANCZOS)
+        variants[variant] = {}
+        for file_format in get_formats():
+            content = _encode(image, file_format)
+            digest = hashlib.sha256(content).hexdigest()
+            path = os.path.join(
+                VARIANTS_DIR, digest[:2], f'{digest}.{file_format}'
+            )
+            # Существующий файл не перезаписывается, но хранилище
+            # обновляет время его изменения (ContentAddressedStorage)
+            path = storage.save(path, ContentFile(content))
+            variants[variant][file_format] = path
+    return variants
+
+
+def process_recipe_image(recipe_ids, name):
+    storage = Recipe._meta.get_field('image').storage
+    variants = build_variants(storage, name, RECIPE_VARIANTS)
+    # Картинку могли заменить, пока шла обработка
+    if Recipe.objects.filter(pk__in=recipe_ids, image=name).update(
+        image_variants=variants, updated_at=timezone.now()
+    ):
+        bump_recipes_version()
+
+
+def process_avatar(user_ids, name):
+    storage = User._meta.get_field('avatar').storage
+    variants = build_variants(storage, name, AVATAR_VARIANTS)
+    if User.objects.filter(pk__in=user_ids, avatar=name).update(
+        avatar_variants=variants
+    ):
+        # Аватар автора входит в ответы с рецептами
+        Recipe.objects.filter(author_id__in=user_ids).update(
+            updated_at=timezone.now()
+        )
+        bump_recipes_version()
+
+
+def _run(task, *args):
+    try:
+        task(*args)
+    except PROCESSING_ERRORS:
+        logger.exception('Image processing failed for %s', args)
+
+
+def _run_in_worker(task, *args):
+    try:
+        _run(task, *args)
+    finally:
+        # У каждого потока пула свое соединение с БД
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='image-processing'
+        )
+    return _executor
+
+
+@contextmanager
+def run_synchronously():
+    """Обработка, запланированная внутри блока, идет в текущем потоке.
+
+    Для команд управления и тестов, которым нужны готовые варианты
+    сразу после сохранения.
+    """
+    token = _synchronous.set(True)
+    try:
+        yield
+    finally:
+        _synchronous.reset(token)
+
+
+def schedule(task, *args):
+    """Запускает обработку после фиксации транзакции.
+
+    Задача уходит в пул потоков и не задерживает ответ; в текущем
+    потоке она выполняется только внутри run_synchronously().
+    """
+    if _synchronous.get():
+        transaction.on_commit(lambda: _run(task, *args))
+    else:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run_in_worker, task, *args)
+        )
+
+
+def needs_processing(field_file, variants):
+    return bool(field_file) and variants.get('source') != field_file.name
+
+
+def get_variant_urls(field_file, variants, request=None):
+    # Варианты от прежней картинки не отдаются
+    if not field_file or needs_processing(field_file, variants):
+        return {}
+    urls = {}
+    for variant, files in variants.items():
+        if variant == 'source':
+            continue
+        urls[variant] = {}
+        for file_format, name in files.items():
+            url = field_file.storage.url(name)
+            urls[variant][file_format] = (
+                request.build_absolute_uri(url) if request else url
+            )
+    return urls
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+PREFIX_END = chr(0x10FFFF)
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Строится лениво при первом запросе и хранит для каждого ингредиента
+    готовый JSON. Сбрасывается сигналами Ingredient и по истечении
+    ``INGREDIENT_INDEX_TTL``, так как ``load_ingredients`` пишет в базу
+    из другого процесса без сигналов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._built_at = 0.0
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _build(self):
+        rows = sorted(
+            Ingredient.objects.order_by().values_list(
+                'id', 'name', 'measurement_unit'
+            ),
+            key=lambda row: (row[1].lower(), row[0])
+        )
+        keys = [name.lower() for _, name, _ in rows]
+        payloads = [
+            json.dumps(
+                {'id': pk, 'name': name, 'measurement_unit': unit},
+                ensure_ascii=False,
+                separators=(',', ':')
+            ).encode()
+            for pk, name, unit in rows
+        ]
+        # Хеш готовых ответов меняется и при правке названия или единицы
+        # измерения, а не только при добавлении и удалении строк
+        state = (hashlib.sha256(b'\n'.join(payloads)).hexdigest(),)
+        return keys, payloads, state
+
+    def is_ready(self):
+        # Готовый индекс отвечает без обращений к базе
+        return self._snapshot is not None and (
+            time.monotonic() - self._built_at <= settings.INGREDIENT_INDEX_TTL
+        )
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and self.is_ready():
+            return snapshot
+        with self._lock:
+            if self._snapshot is snapshot:
+                self._snapshot = self._build()
+                self._built_at = time.monotonic()
+            return self._snapshot
+
+    def search(self, prefix=''):
+        """Возвращает JSON-массив ингредиентов и состояние индекса."""
+        keys, payloads, state = self._get_snapshot()
+        prefix = prefix.lower()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + PREFIX_END, start)
+        return b'[' + b','.join(payloads[start:end]) + b']', state
+
+
+ingredient_index = IngredientIndex()
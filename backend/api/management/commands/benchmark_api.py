@@ -0,0 +1,375 @@
+import base64
+import io
+import json
+import logging
+import statistics
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes import counters, shopping_list
+from recipes.fake_data import FakeDataGenerator
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+BATCH_SIZE = 1000
+
+
+def make_image_base64():
+    buffer = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, format='PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(0, round(percent / 100 * len(values)) - 1)
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными и замеряет количество '
+        'запросов, задержку и размер ответа для каждого маршрута API. '
+        'Данные откатываются после прогона, если не указан --keep-data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--favorites', type=int, default=50000)
+        parser.add_argument('--carts', type=int, default=20000)
+        parser.add_argument('--subscriptions', type=int, default=20000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнить каждый запрос'
+        )
+        parser.add_argument(
+            '--output', default='benchmark_report.json',
+            help='Путь к JSON-отчету'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON-отчет, с которым сравнивается текущий прогон'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Допустимый относительный рост p95 задержки'
+        )
+        parser.add_argument(
+            '--keep-data', action='store_true',
+            help='Не откатывать сгенерированные данные'
+        )
+
+    def handle(self, *args, **options):
+        # CaptureQueriesContext включает логирование каждого SQL-запроса
+        db_logger = logging.getLogger('django.db.backends')
+        db_log_level = db_logger.level
+        db_logger.setLevel(logging.WARNING)
+        try:
+            with (
+                tempfile.TemporaryDirectory() as media_root,
+                override_settings(MEDIA_ROOT=media_root)
+            ):
+                report = self._run(options)
+        finally:
+            db_logger.setLevel(db_log_level)
+
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self._print_report(report)
+        self.stdout.write(
+            self.style.SUCCESS(f'Report saved to {options["output"]}')
+        )
+        if options['baseline']:
+            self._compare(report, options['baseline'], options['tolerance'])
+
+    def _run(self, options):
+        with transaction.atomic():
+            started = time.perf_counter()
+            dataset = self._seed(options)
+            self.stdout.write(
+                f'Seeded dataset in {time.perf_counter() - started:.1f}s'
+            )
+            endpoints = self._benchmark(dataset, options['repeat'])
+            # Токен нужен только замерам и не остается даже с --keep-data
+            Token.objects.filter(key=dataset['token']).delete()
+            if not options['keep_data']:
+                transaction.set_rollback(True)
+        return {
+            'meta': {
+                'vendor': connection.vendor,
+                'repeat': options['repeat'],
+                'seed': options['seed'],
+                'dataset': {
+                    key: options[key] for key in (
+                        'users', 'recipes', 'favorites',
+                        'carts', 'subscriptions', 'ingredients'
+                    )
+                },
+            },
+            'endpoints': endpoints,
+        }
+
+    def _seed(self, options):
+        generator = FakeDataGenerator(
+            seed=options['seed'],
+            prefix=f'bench{uuid.uuid4().hex[:6]}_',
+            password=BENCHMARK_PASSWORD,
+            batch_size=BATCH_SIZE,
+        )
+        dataset = generator.generate(
+            users=max(options['users'], 2),
+            recipes=max(options['recipes'], 1),
+            favorites=options['favorites'],
+            carts=options['carts'],
+            subscriptions=options['subscriptions'],
+            min_ingredients=options['ingredients'],
+        )
+        users, recipes = dataset['users'], dataset['recipes']
+        actor, guest = users[0], users[1]
+        # У actor всегда есть избранное, корзина и подписки,
+        # независимо от того, как выпало распределение
+        target, unfollowed = recipes[-1], users[-1]
+        for model, field, items in (
+            (Favorite, 'recipe', recipes[:50]),
+            (ShoppingCart, 'recipe', recipes[:20]),
+            (Subscription, 'following', users[2:32]),
+        ):
+            model.objects.bulk_create(
+                [model(user=actor, **{field: item}) for item in items],
+                ignore_conflicts=True
+            )
+        shopping_list.rebuild([actor.id])
+        counters.reconcile([recipe.id for recipe in recipes[:50]])
+        # Цели изменяющих запросов не должны быть связаны с actor заранее
+        Favorite.objects.filter(user=actor, recipe=target).delete()
+        ShoppingCart.objects.filter(user=actor, recipe=target).delete()
+        Subscription.objects.filter(user=actor, following=unfollowed).delete()
+        token = Token.objects.create(user=actor)
+        return {
+            'actor': actor,
+            'guest': guest,
+            'token': token.key,
+            'author': recipes[0].author,
+            'recipe': recipes[0],
+            'target': target,
+            'ingredient': dataset['ingredients'][0],
+            'unfollowed': unfollowed,
+        }
+
+    def _scenarios(self, dataset):
+        # Изменяющие запросы идут парами, чтобы каждая итерация
+        # начиналась с одного и того же состояния.
+        recipe = dataset['recipe'].id
+        target = dataset['target'].id
+        author = dataset['author'].id
+        ingredient = dataset['ingredient'].id
+        unfollowed = dataset['unfollowed'].id
+        image = make_image_base64()
+        recipe_data = {
+            'ingredients': [{'id': ingredient, 'amount': 10}],
+            'name': 'Benchmark',
+            'image': image,
+            'text': 'Benchmark',
+            'cooking_time': 10,
+        }
+        return [
+            ('users-list', 'get', '/api/users/', None, False),
+            ('users-list-auth', 'get', '/api/users/', None, True),
+            ('users-create', 'post', '/api/users/', {
+                'email': 'signup{n}@example.com',
+                'username': 'signup{n}',
+                'first_name': 'Bench',
+                'last_name': 'Signup',
+                'password': BENCHMARK_PASSWORD,
+            }, False),
+            ('users-detail', 'get', f'/api/users/{author}/', None, False),
+            ('users-me', 'get', '/api/users/me/', None, True),
+            ('users-avatar-put', 'put', '/api/users/me/avatar/',
+             {'avatar': image}, True),
+            ('users-avatar-delete', 'delete', '/api/users/me/avatar/',
+             None, True),
+            ('users-subscriptions', 'get', '/api/users/subscriptions/',
+             None, True),
+            ('users-subscriptions-limit', 'get',
+             '/api/users/subscriptions/?recipes_limit=3', None, True),
+            ('users-subscribe', 'post',
+             f'/api/users/{unfollowed}/subscribe/', None, True),
+            ('users-unsubscribe', 'delete',
+             f'/api/users/{unfollowed}/subscribe/', None, True),
+            ('recipes-list', 'get', '/api/recipes/', None, False),
+            ('recipes-list-auth', 'get', '/api/recipes/', None, True),
+            ('recipes-list-page', 'get', '/api/recipes/?page=50&limit=6',
+             None, False),
+            ('recipes-list-author', 'get',
+             f'/api/recipes/?author={author}', None, False),
+            ('recipes-list-favorited', 'get',
+             '/api/recipes/?is_favorited=1', None, True),
+            ('recipes-list-in-cart', 'get',
+             '/api/recipes/?is_in_shopping_cart=1', None, True),
+            ('recipes-detail', 'get', f'/api/recipes/{recipe}/',
+             None, False),
+            ('recipes-detail-auth', 'get', f'/api/recipes/{recipe}/',
+             None, True),
+            ('recipes-short-link', 'get', f'/api/recipes/{recipe}/short/',
+             None, False),
+            ('recipes-create', 'post', '/api/recipes/', recipe_data, True),
+            ('recipes-update', 'patch', '/api/recipes/{created}/',
+             recipe_data, True),
+            ('recipes-delete', 'delete', '/api/recipes/{created}/',
+             None, True),
+            ('recipes-favorite', 'post', f'/api/recipes/{target}/favorite/',
+             None, True),
+            ('recipes-unfavorite', 'delete',
+             f'/api/recipes/{target}/favorite/', None, True),
+            ('recipes-cart-add', 'post',
+             f'/api/recipes/{target}/shopping_cart/', None, True),
+            ('recipes-cart-remove', 'delete',
+             f'/api/recipes/{target}/shopping_cart/', None, True),
+            ('recipes-download-cart', 'get',
+             '/api/recipes/download_shopping_cart/', None, True),
+            ('ingredients-list', 'get', '/api/ingredients/', None, False),
+            ('ingredients-search', 'get', '/api/ingredients/?name=а',
+             None, False),
+            ('ingredients-detail', 'get', f'/api/ingredients/{ingredient}/',
+             None, False),
+            ('auth-token-login', 'post', '/api/auth/token/login/', {
+                'email': dataset['guest'].email,
+                'password': BENCHMARK_PASSWORD,
+            }, False),
+            ('auth-token-logout', 'post', '/api/auth/token/logout/',
+             None, 'guest'),
+        ]
+
+    def _benchmark(self, dataset, repeat):
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost'
+        )
+        client = Client(HTTP_HOST=host)
+        scenarios = self._scenarios(dataset)
+        results = {
+            name: {
+                'method': method.upper(),
+                'path': path,
+                'statuses': set(),
+                'queries': [],
+                'latency': [],
+                'bytes': [],
+            }
+            for name, method, path, _, _ in scenarios
+        }
+        state = {'created': None, 'guest_token': None}
+        for iteration in range(repeat):
+            for name, method, path, data, auth in scenarios:
+                headers = {}
+                if auth == 'guest':
+                    headers['HTTP_AUTHORIZATION'] = (
+                        f'Token {state["guest_token"]}'
+                    )
+                elif auth:
+                    headers['HTTP_AUTHORIZATION'] = (
+                        f'Token {dataset["token"]}'
+                    )
+                path = path.format(n=iteration, created=state['created'])
+                if isinstance(data, dict):
+                    data = {
+                        key: (value.format(n=iteration)
+                              if isinstance(value, str)
+                              and not value.startswith('data:')
+                              else value)
+                        for key, value in data.items()
+                    }
+                request = getattr(client, method)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = request(
+                        path,
+                        data=json.dumps(data) if data else None,
+                        content_type='application/json',
+                        **headers
+                    )
+                    content = (
+                        b''.join(response.streaming_content)
+                        if response.streaming else response.content
+                    )
+                    elapsed = time.perf_counter() - started
+                result = results[name]
+                result['statuses'].add(response.status_code)
+                result['queries'].append(len(queries.captured_queries))
+                result['latency'].append(elapsed * 1000)
+                result['bytes'].append(len(content))
+                if name == 'recipes-create' and response.status_code == 201:
+                    state['created'] = response.json()['id']
+                if name == 'auth-token-login' and response.status_code == 200:
+                    state['guest_token'] = response.json()['auth_token']
+        return {
+            name: {
+                'method': result['method'],
+                'path': result['path'],
+                'statuses': sorted(result['statuses']),
+                'queries': max(result['queries']),
+                'p50_ms': round(statistics.median(result['latency']), 3),
+                'p95_ms': round(percentile(result['latency'], 95), 3),
+                'bytes': max(result['bytes']),
+            }
+            for name, result in results.items()
+        }
+
+    def _print_report(self, report):
+        self.stdout.write(
+            f'{"endpoint":<28}{"status":>10}{"queries":>9}'
+            f'{"p50 ms":>10}{"p95 ms":>10}{"bytes":>10}'
+        )
+        for name, result in report['endpoints'].items():
+            statuses = ','.join(map(str, result['statuses']))
+            self.stdout.write(
+                f'{name:<28}{statuses:>10}{result["queries"]:>9}'
+                f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}'
+                f'{result["bytes"]:>10}'
+            )
+
+    def _compare(self, report, baseline_path, tolerance):
+        try:
+            with open(baseline_path, encoding='utf-8') as file:
+                baseline = json.load(file)['endpoints']
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(
+                f'Cannot read baseline {baseline_path}: {error}'
+            )
+
+        regressions = []
+        for name, result in report['endpoints'].items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if result['queries'] > previous['queries']:
+                regressions.append(
+                    f'{name}: queries {previous["queries"]} -> '
+                    f'{result["queries"]}'
+                )
+            if result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'{name}: p95 {previous["p95_ms"]:.2f}ms -> '
+                        f'{result["p95_ms"]:.2f}ms'
+                    )
+                )
+        if regressions:
+            raise CommandError(
+                'Query count regressions:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No query count regressions'))
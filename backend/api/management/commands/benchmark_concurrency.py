@@ -0,0 +1,246 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.benchmark_api import percentile
+from recipes.models import Recipe
+from users.models import User
+
+# Команды запуска сервера для каждого стека; ASGI-стек включает
+# асинхронные представления (api.async_views)
+STACKS = {
+    'wsgi': (
+        ['gunicorn', '--worker-class', 'sync', 'foodgram_backend.wsgi'],
+        {'ASYNC_READ_VIEWS': 'False'},
+    ),
+    'asgi': (
+        [
+            'gunicorn', '--worker-class', 'uvicorn_worker.UvicornWorker',
+            'foodgram_backend.asgi:application'
+        ],
+        {'ASYNC_READ_VIEWS': 'True'},
+    ),
+}
+STARTUP_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность синхронного (gunicorn) и '
+        'асинхронного (gunicorn + uvicorn) серверов на горячих GET-запросах '
+        'при одновременных соединениях'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stacks', nargs='+', choices=STACKS, default=list(STACKS)
+        )
+        parser.add_argument(
+            '--url',
+            help='Замерить уже запущенный сервер вместо запуска своих'
+        )
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[16, 64],
+            help='Число одновременных соединений; можно указать несколько'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность каждого замера в секундах'
+        )
+        parser.add_argument(
+            '--user',
+            help='Имя пользователя, от которого идут запросы '
+                 '(по умолчанию анонимно)'
+        )
+        parser.add_argument('--output', help='Путь к JSON-отчету')
+
+    def handle(self, *args, **options):
+        paths = self.get_paths()
+        headers = {'Accept': 'application/json'}
+        created_token = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'User {options["user"]} not found')
+            # Сервер проверяет токен по базе; созданный для замера токен
+            # удаляется после него, токен пользователя остается как был
+            token, created = Token.objects.get_or_create(user=user)
+            if created:
+                created_token = token
+            headers['Authorization'] = f'Token {token.key}'
+        try:
+            report = self.run_targets(paths, headers, options)
+        finally:
+            if created_token is not None:
+                created_token.delete()
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(f'Report saved to {options["output"]}')
+
+    def run_targets(self, paths, headers, options):
+        if options['url']:
+            targets = [(options['url'], None)]
+        else:
+            targets = [
+                (f'http://127.0.0.1:{options["port"]}', stack)
+                for stack in options['stacks']
+            ]
+        report = []
+        for url, stack in targets:
+            server = self.start_server(stack, options) if stack else None
+            try:
+                self.wait_for_server(url, server)
+                for concurrency in options['concurrency']:
+                    # Прогрев: индекс ингредиентов, соединения с базой
+                    self.run_load(url, paths, headers, concurrency, 1)
+                    result = self.run_load(
+                        url, paths, headers, concurrency,
+                        options['duration']
+                    )
+                    result.update(stack=stack or url, concurrency=concurrency)
+                    report.append(result)
+                    self.print_result(result)
+            finally:
+                if server:
+                    server.terminate()
+                    server.wait()
+        return report
+
+    @staticmethod
+    def get_paths():
+        recipe = Recipe.objects.order_by('-pk').first()
+        if recipe is None:
+            raise CommandError(
+                'No recipes: run generate_fake_data or load_recipes first'
+            )
+        return [
+            '/api/recipes/',
+            '/api/recipes/?page=2&limit=6',
+            f'/api/recipes/?author={recipe.author_id}',
+            f'/api/recipes/{recipe.pk}/',
+            f'/api/recipes/{recipe.pk}/short/',
+            '/api/ingredients/?name=%D1%81',
+        ]
+
+    def start_server(self, stack, options):
+        command, environment = STACKS[stack]
+        command = [
+            *command,
+            '--bind', f'127.0.0.1:{options["port"]}',
+            '--workers', str(options['workers']),
+            '--log-level', 'warning',
+        ]
+        self.stdout.write(f'Starting {stack}: {" ".join(command)}')
+        return subprocess.Popen(
+            command,
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                **environment,
+                'DJANGO_SETTINGS_MODULE': os.environ.get(
+                    'DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings'
+                ),
+                'PYTHONPATH': os.pathsep.join(sys.path),
+            },
+        )
+
+    @staticmethod
+    def wait_for_server(url, server):
+        parts = urlsplit(url)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if server and server.poll() is not None:
+                raise CommandError('Server exited during startup')
+            try:
+                socket.create_connection(
+                    (parts.hostname, parts.port or 80), timeout=1
+                ).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Server at {url} did not start')
+
+    @staticmethod
+    def run_load(url, paths, headers, concurrency, duration):
+        parts = urlsplit(url)
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(concurrency + 1)
+        deadline = [0.0]
+
+        def worker(offset):
+            # Соединение держится открытым, как у браузера или прокси
+            connection = http.client.HTTPConnection(
+                parts.hostname, parts.port or 80, timeout=30
+            )
+            own_latencies = []
+            own_errors = 0
+            index = offset
+            start.wait()
+            while time.monotonic() < deadline[0]:
+                path = paths[index % len(paths)]
+                index += 1
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status >= 400:
+                        own_errors += 1
+                    else:
+                        own_latencies.append(
+                            time.perf_counter() - started
+                        )
+                except (OSError, http.client.HTTPException):
+                    own_errors += 1
+                    connection.close()
+            connection.close()
+            with lock:
+                latencies.extend(own_latencies)
+                errors.append(own_errors)
+
+        threads = [
+            threading.Thread(target=worker, args=(number,))
+            for number in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        started = time.monotonic()
+        deadline[0] = started + duration
+        start.wait()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        return {
+            'requests': len(latencies),
+            'errors': sum(errors),
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(
+                percentile(latencies, 50) * 1000, 1
+            ) if latencies else None,
+            'p95_ms': round(
+                percentile(latencies, 95) * 1000, 1
+            ) if latencies else None,
+        }
+
+    def print_result(self, result):
+        self.stdout.write(
+            f'{result["stack"]:>6} c={result["concurrency"]:<4} '
+            f'{result["rps"]:>8} req/s  p50 {result["p50_ms"]} ms  '
+            f'p95 {result["p95_ms"]} ms  errors {result["errors"]}'
+        )
@@ -0,0 +1,98 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.images import VARIANTS_DIR
+from recipes.models import Recipe
+from users.models import User
+
+
+def walk(storage, directory):
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield os.path.join(directory, name)
+    for name in directories:
+        yield from walk(storage, os.path.join(directory, name))
+
+
+def variant_names(variants):
+    for variant, files in variants.items():
+        if variant != 'source':
+            yield from files.values()
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из медиа-хранилища файлы картинок, на которые не '
+        'ссылается ни один рецепт или пользователь'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено'
+        )
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help='Не трогать файлы моложе стольких часов (по умолчанию 24): '
+                 'их может сохранять еще не завершенный запрос'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        references = self.count_references()
+        cutoff = timezone.now() - timedelta(hours=options['min_age'])
+        directories = (
+            Recipe._meta.get_field('image').upload_to,
+            User._meta.get_field('avatar').upload_to,
+            VARIANTS_DIR,
+        )
+        removed = kept = freed = 0
+        for directory in directories:
+            for name in walk(default_storage, directory.rstrip('/')):
+                if references[name]:
+                    kept += 1
+                    continue
+                if default_storage.get_modified_time(name) > cutoff:
+                    continue
+                freed += default_storage.size(name)
+                removed += 1
+                if self.verbosity > 1:
+                    self.stdout.write(f'Orphaned: {name}')
+                if not options['dry_run']:
+                    default_storage.delete(name)
+
+        if self.verbosity > 1:
+            for name, count in references.most_common(10):
+                self.stdout.write(f'{count:>8} references: {name}')
+        action = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {removed} orphaned files ({freed / 1024 ** 2:.1f} MB), '
+            f'{kept} files are referenced '
+            f'{sum(references.values())} times'
+        ))
+
+    @staticmethod
+    def count_references():
+        # Счетчики ссылок считаются по самим записям, а не хранятся
+        # отдельно, поэтому не могут разойтись с данными
+        references = Counter()
+        for image, variants in Recipe.objects.values_list(
+            'image', 'image_variants'
+        ).iterator():
+            references[image] += 1
+            references.update(variant_names(variants))
+        for avatar, variants in User.objects.values_list(
+            'avatar', 'avatar_variants'
+        ).iterator():
+            if avatar:
+                references[avatar] += 1
+            references.update(variant_names(variants))
+        return references
@@ -0,0 +1,211 @@
+import json
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+# Кэши ответов и числа строк скрыли бы запросы, которые нужно проверить
+DUMMY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+# Ожидаемые полные чтения: индекс автодополнения (api.ingredient_index)
+# строится из всей таблицы ингредиентов
+EXPECTED_SCANS = {
+    ('ingredients-list', 'recipes_ingredient'),
+    ('ingredients-search', 'recipes_ingredient'),
+}
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)$')
+# Псевдонимы таблиц, которые Django дает в подзапросах и JOIN: U0, T3
+SQL_TABLE = re.compile(r'(?:FROM|JOIN)\s+"(\w+)"(?:\s+([A-Z]\d+)\b)?')
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk_plan(child)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN ANALYZE для SQL-запросов каждого маршрута '
+        'чтения API на текущих данных и отмечает последовательные '
+        'чтения таблиц больше заданного числа строк'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=int, default=1000,
+            help='Сколько строк может прочитать Seq Scan без предупреждения'
+        )
+        parser.add_argument(
+            '--user',
+            help='Пользователь для маршрутов с авторизацией '
+                 '(по умолчанию тот, у кого больше всего избранного)'
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершиться с ошибкой, если найдены такие чтения'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.threshold = options['threshold']
+        user = self.get_user(options['user'])
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost'
+        )
+        # Без токена в базе: команду запускают на рабочих данных
+        client = APIClient(HTTP_HOST=host)
+        client.force_authenticate(user=user)
+
+        flagged = []
+        with override_settings(CACHES=DUMMY_CACHES):
+            for name, path in self.get_endpoints(user):
+                ingredient_index.invalidate()
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(path)
+                if response.status_code >= 400:
+                    self.stdout.write(self.style.WARNING(
+                        f'{name}: {path} returned {response.status_code}'
+                    ))
+                selects = dict.fromkeys(
+                    query['sql'] for query in queries.captured_queries
+                    if query['sql'].lstrip().upper().startswith('SELECT')
+                )
+                self.stdout.write(f'{name}: {len(selects)} queries')
+                for sql in selects:
+                    for table, rows in self.explain(sql):
+                        if (name, table) in EXPECTED_SCANS:
+                            continue
+                        flagged.append((name, table, rows, sql))
+                        self.stdout.write(self.style.ERROR(
+                            f'  Seq Scan on {table}: {rows} rows'
+                        ))
+                        if self.verbosity > 1:
+                            self.stdout.write(f'    {sql}')
+
+        if not flagged:
+            self.stdout.write(self.style.SUCCESS(
+                f'No sequential scans over {self.threshold} rows'
+            ))
+            return
+        message = (
+            f'{len(flagged)} sequential scans over {self.threshold} rows'
+        )
+        if options['fail']:
+            raise CommandError(message)
+        self.stdout.write(self.style.WARNING(message))
+
+    @staticmethod
+    def get_user(username):
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f'User {username} not found')
+            return user
+        user = User.objects.annotate(
+            favorites_total=Count('favorite')
+        ).order_by('-favorites_total', 'id').first()
+        if user is None:
+            raise CommandError('No users: run generate_fake_data first')
+        return user
+
+    @staticmethod
+    def get_endpoints(user):
+        recipe = Recipe.objects.order_by('-pk').first()
+        ingredient = Ingredient.objects.order_by('pk').first()
+        endpoints = [
+            ('users-list', '/api/users/'),
+            ('users-list-page', '/api/users/?page=10'),
+            ('users-detail', f'/api/users/{user.pk}/'),
+            ('users-subscriptions', '/api/users/subscriptions/'),
+            ('users-subscriptions-limit',
+             '/api/users/subscriptions/?recipes_limit=3'),
+            ('users-subscriptions-cursor',
+             '/api/users/subscriptions/?cursor='),
+            ('recipes-list', '/api/recipes/'),
+            ('recipes-list-page', '/api/recipes/?page=50'),
+            ('recipes-list-cursor', '/api/recipes/?cursor='),
+            ('recipes-list-author', f'/api/recipes/?author={user.pk}'),
+            ('recipes-list-favorited', '/api/recipes/?is_favorited=1'),
+            ('recipes-list-in-cart', '/api/recipes/?is_in_shopping_cart=1'),
+            ('recipes-search', '/api/recipes/?search=суп'),
+            ('recipes-trending', '/api/recipes/trending/'),
+            ('recipes-trending-page', '/api/recipes/trending/?page=20'),
+            ('recipes-download-cart', '/api/recipes/download_shopping_cart/'),
+            ('ingredients-list', '/api/ingredients/'),
+            ('ingredients-search', '/api/ingredients/?name=а'),
+        ]
+        if recipe is not None:
+            endpoints += [
+                ('recipes-detail', f'/api/recipes/{recipe.pk}/'),
+                ('recipes-short-link', f'/api/recipes/{recipe.pk}/short/'),
+            ]
+        if ingredient is not None:
+            endpoints.append(
+                ('ingredients-detail', f'/api/ingredients/{ingredient.pk}/')
+            )
+        return endpoints
+
+    def explain(self, sql):
+        """Возвращает (таблица, строк) для каждого слишком большого Seq Scan.
+
+        ANALYZE выполняет запрос, поэтому он идет в транзакции,
+        которая откатывается.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}')
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scans = list(self.postgres_scans(plan[0]['Plan']))
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                scans = list(self.sqlite_scans(sql, cursor.fetchall()))
+            transaction.set_rollback(True)
+        return [
+            (table, rows) for table, rows in scans if rows > self.threshold
+        ]
+
+    @staticmethod
+    def postgres_scans(plan):
+        for node in walk_plan(plan):
+            if node['Node Type'] != 'Seq Scan':
+                continue
+            # Прочитанные строки: отданные и отброшенные фильтром
+            rows = (
+                node.get('Actual Rows', 0)
+                + node.get('Rows Removed by Filter', 0)
+            ) * node.get('Actual Loops', 1)
+            yield node['Relation Name'], rows
+
+    @staticmethod
+    def sqlite_scans(sql, rows):
+        tables = {}
+        for table, alias in SQL_TABLE.findall(sql):
+            tables[table] = table
+            if alias:
+                tables[alias] = table
+        # SQLite не сообщает число прочитанных строк, поэтому берется
+        # размер таблицы; чтение по индексу выводится как SCAN ... USING
+        for row in rows:
+            match = SQLITE_SCAN.match(row[-1])
+            if match and match.group(1) in tables:
+                table = tables[match.group(1)]
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT COUNT(*) FROM '
+                        f'{connection.ops.quote_name(table)}'
+                    )
+                    yield table, cursor.fetchone()[0]
@@ -0,0 +1,78 @@
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api import images
+from recipes.models import Recipe
+from users.models import User
+
+
+def _process(task, *args):
+    try:
+        task(*args)
+        return True
+    except images.PROCESSING_ERRORS as error:
+        return error
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает уменьшенные копии фото рецептов и аватаров, '
+        'которые еще не обработаны (например, после загрузки дампа)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Обработать заново все картинки'
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            default=settings.IMAGE_PROCESSING_WORKERS
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        # Одна и та же картинка (например, из дампа) обрабатывается
+        # один раз для всех объектов, которые на нее ссылаются
+        tasks = defaultdict(list)
+        for model, field, variants_field, task in (
+            (Recipe, 'image', 'image_variants',
+             images.process_recipe_image),
+            (User, 'avatar', 'avatar_variants', images.process_avatar),
+        ):
+            queryset = model.objects.exclude(
+                **{field: ''}
+            ).exclude(**{f'{field}__isnull': True}).only(
+                'id', field, variants_field
+            )
+            for obj in queryset.iterator():
+                field_file = getattr(obj, field)
+                if options['all'] or images.needs_processing(
+                    field_file, getattr(obj, variants_field)
+                ):
+                    tasks[task, field_file.name].append(obj.pk)
+
+        processed = 0
+        with ThreadPoolExecutor(max(options['workers'], 1)) as pool:
+            results = pool.map(
+                lambda item: _process(item[0][0], item[1], item[0][1]),
+                tasks.items()
+            )
+            for ((_, name), pks), result in zip(tasks.items(), results):
+                if result is True:
+                    processed += len(pks)
+                else:
+                    self.stdout.write(self.style.ERROR(
+                        f'Failed to process {name}: {result}'
+                    ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(tasks)} images for {processed} objects in '
+            f'{time.perf_counter() - started:.1f}s'
+        ))
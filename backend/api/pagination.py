@@ -1,7 +1,99 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from .caching import get_count
 from .constants import PAGE_SIZE
 
 
+class CachedCountPaginator(Paginator):
+    """Paginator, который берет число строк из get_count.
+
+    Значение можно передать готовым (``counted``), если оно уже
+    получено для ETag.
+    """
+
+    def __init__(self, *args, counted=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counted = counted
+
+    @cached_property
+    def count(self):
+        if self.counted is None:
+            self.counted = get_count(self.object_list)
+        return self.counted.count
+
+    @property
+    def count_exact(self):
+        return self.counted is None or self.counted.exact
+
+
+class KeysetPagination(CursorPagination):
+    """Курсорная пагинация по ``view.cursor_ordering``.
+
+    Следующая страница выбирается условием по ключу сортировки,
+    без OFFSET и COUNT(*), поэтому не дорожает с глубиной.
+    """
+    page_size = PAGE_SIZE
+    page_size_query_param = 'limit'
+    ordering = ('id',)
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(getattr(view, 'cursor_ordering', self.ordering))
+
+
 class Pagination(PageNumberPagination):
+    """Постраничная пагинация с курсорным режимом по ``?cursor=``.
+
+    Без параметра ``cursor`` ответ содержит ``count``, ``count_exact``,
+    ``next``, ``previous`` и ``results``. С параметром (в том числе пустым для
+    первой страницы) ответ содержит только ``next``, ``previous`` и
+    ``results``, а ссылки ведут по курсору.
+
+    Число строк берется из кэша или оценки (api.caching.get_count),
+    ``count_exact`` равен False, если ``count`` приблизителен.
+    """
+    django_paginator_class = CachedCountPaginator
     page_size = PAGE_SIZE
-    page_size_query_param = 'limit' 
\ No newline at end of file
+    page_size_query_param = 'limit'
+    cursor_query_param = KeysetPagination.cursor_query_param
+
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (
+            self.cursor_query_param
+            and self.cursor_query_param in request.query_params
+        ):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return Response({
+            'count': self.page.paginator.count,
+            'count_exact': self.page.paginator.count_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count_exact'] = {
+            'type': 'boolean',
+            'example': True,
+        }
+        return schema
+
+
+class RankPagination(Pagination):
+    """Постраничная пагинация рейтинга без курсорного режима.
+
+    Рейтинг пересчитывается целиком, поэтому курсор по месту
+    в рейтинге после пересчета указывал бы на другие рецепты.
+    """
+    cursor_query_param = None
@@ -0,0 +1,247 @@
+import csv
+import json
+import os
+import zlib
+from functools import lru_cache
+
+from django.conf import settings
+from PIL import ImageFont
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+@lru_cache
+def _load_font(path, chars):
+    # Шрифт читается и сжимается один раз на процесс
+    font = ImageFont.truetype(path, 1000)
+    widths = b' '.join(b'%d' % round(font.getlength(char)) for char in chars)
+    ascent, descent = font.getmetrics()
+    with open(path, 'rb') as file:
+        data = file.read()
+    return widths, ascent, descent, len(data), zlib.compress(data)
+
+
+def format_shopping_list_row(name, unit, amount):
+    return f'{name} ({unit}) - {amount}'
+
+
+class TextShoppingListRenderer(BaseRenderer):
+    """Список покупок в виде текста, по строке на ингредиент.
+
+    Рендереры списка покупок используются для выбора формата
+    через ``?format=`` или Accept; сам файл отдается потоком
+    из ``stream``. Ответы с ошибкой рендерятся в JSON
+    (RecipeViewSet.finalize_response).
+    """
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def stream(self, rows):
+        for row in rows:
+            yield f'{format_shopping_list_row(*row)}\n'.encode()
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def stream(self, rows):
+        writer = csv.writer(_Echo())
+        # BOM, чтобы Excel открыл файл в UTF-8
+        yield '\ufeff'.encode()
+        yield writer.writerow(('name', 'measurement_unit', 'amount')).encode()
+        for row in rows:
+            yield writer.writerow(row).encode()
+
+
+class JSONShoppingListRenderer(JSONRenderer):
+    def stream(self, rows):
+        separator = b'['
+        for name, unit, amount in rows:
+            yield separator + json.dumps(
+                {'name': name, 'measurement_unit': unit, 'amount': amount},
+                ensure_ascii=False
+            ).encode()
+            separator = b','
+        yield b']' if separator == b',' else b'[]'
+
+
+class PDFShoppingListRenderer(BaseRenderer):
+    """PDF, который пишется объект за объектом по мере чтения строк.
+
+    Кириллица выводится однобайтовым шрифтом TrueType с кодировкой
+    cp1251; шрифт из ``SHOPPING_LIST_PDF_FONT`` встраивается в файл,
+    если он найден.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    encoding = 'cp1251'
+    font_size = 11
+    leading = 16
+    lines_per_page = 48
+    page_width = 595
+    page_height = 842
+    margin = 50
+
+    # Номера объектов, известные заранее: страницы и каталог
+    # дописываются в конец, когда известно число страниц.
+    CATALOG, PAGES, FONT, TO_UNICODE, FONT_DESCRIPTOR, FONT_FILE = range(1, 7)
+    FIRST_PAGE_OBJECT = 7
+
+    def stream(self, rows):
+        return self.stream_lines(
+            format_shopping_list_row(*row) for row in rows
+        )
+
+    def stream_lines(self, lines):
+        offsets = {}
+        position = 0
+
+        def write_object(number, body):
+            nonlocal position
+            offsets[number] = position
+            chunk = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+            position += len(chunk)
+            return chunk
+
+        header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        position += len(header)
+        yield header
+        for number, body in self._font_objects():
+            yield write_object(number, body)
+
+        page_numbers = []
+        number = self.FIRST_PAGE_OBJECT
+        for page_lines in self._pages(lines):
+            content = zlib.compress(self._page_content(page_lines))
+            yield write_object(number, self._stream_object(
+                content, b'/Filter /FlateDecode'
+            ))
+            yield write_object(number + 1, (
+                b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+                b'/Resources << /Font << /F1 %d 0 R >> >> '
+                b'/Contents %d 0 R >>' % (
+                    self.PAGES, self.page_width, self.page_height,
+                    self.FONT, number
+                )
+            ))
+            page_numbers.append(number + 1)
+            number += 2
+
+        kids = b' '.join(b'%d 0 R' % page for page in page_numbers)
+        yield write_object(self.PAGES, b'<< /Type /Pages /Kids [%s] '
+                                       b'/Count %d >>' % (
+                                           kids, len(page_numbers)))
+        yield write_object(
+            self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES
+        )
+
+        size = max(offsets) + 1
+        xref = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        for index in range(1, size):
+            if index in offsets:
+                xref.append(b'%010d 00000 n \n' % offsets[index])
+            else:
+                xref.append(b'0000000000 65535 f \n')
+        yield b''.join(xref) + (
+            b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (size, self.CATALOG, position)
+        )
+
+    def _pages(self, lines):
+        page = []
+        for line in lines:
+            page.append(line)
+            if len(page) == self.lines_per_page:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def _page_content(self, lines):
+        commands = [
+            b'BT /F1 %d Tf %d TL %d %d Td' % (
+                self.font_size, self.leading, self.margin,
+                self.page_height - self.margin
+            )
+        ]
+        for line in lines:
+            text = line.encode(self.encoding, 'replace')
+            text = (
+                text.replace(b'\\', b'\\\\')
+                .replace(b'(', b'\\(')
+                .replace(b')', b'\\)')
+            )
+            commands.append(b'(%s) Tj T*' % text)
+        commands.append(b'ET')
+        return b'\n'.join(commands)
+
+    @staticmethod
+    def _stream_object(content, extra=b''):
+        return b'<< /Length %d %s >>\nstream\n%s\nendstream' % (
+            len(content), extra, content
+        )
+
+    def _font_objects(self):
+        codes = range(32, 256)
+        chars = bytes(codes).decode(self.encoding, 'replace')
+        differences = b' '.join(
+            b'/uni%04X' % ord(char) for char in chars[128 - 32:]
+        )
+        encoding = (
+            b'<< /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+            b'/Differences [128 %s] >>' % differences
+        )
+        # ToUnicode нужен для копирования и поиска текста в PDF
+        to_unicode = b'\n'.join((
+            b'/CIDInit /ProcSet findresource begin 12 dict begin begincmap',
+            b'/CMapName /ShoppingList-UCS def /CMapType 2 def',
+            b'1 begincodespacerange <00> <FF> endcodespacerange',
+            b'%d beginbfchar' % len(chars),
+            *(
+                b'<%02X> <%04X>' % (code, ord(char))
+                for code, char in zip(codes, chars)
+            ),
+            b'endbfchar endcmap',
+            b'CMapName currentdict /CMap defineresource pop end end',
+        ))
+        yield self.TO_UNICODE, self._stream_object(to_unicode)
+        font_path = settings.SHOPPING_LIST_PDF_FONT
+        if not font_path or not os.path.exists(font_path):
+            # Без файла шрифта программа просмотра подставит системный
+            yield self.FONT, (
+                b'<< /Type /Font /Subtype /TrueType /BaseFont /ArialMT '
+                b'/FirstChar 32 /LastChar 255 /Encoding %s '
+                b'/ToUnicode %d 0 R >>' % (encoding, self.TO_UNICODE)
+            )
+            return
+
+        widths, ascent, descent, length, compressed = _load_font(
+            font_path, chars
+        )
+        yield self.FONT, (
+            b'<< /Type /Font /Subtype /TrueType /BaseFont /ShoppingListFont '
+            b'/FirstChar 32 /LastChar 255 /Widths [%s] '
+            b'/FontDescriptor %d 0 R /Encoding %s /ToUnicode %d 0 R >>' % (
+                widths, self.FONT_DESCRIPTOR, encoding, self.TO_UNICODE
+            )
+        )
+        yield self.FONT_DESCRIPTOR, (
+            b'<< /Type /FontDescriptor /FontName /ShoppingListFont '
+            b'/Flags 32 /FontBBox [-1000 -500 2000 1200] /ItalicAngle 0 '
+            b'/Ascent %d /Descent %d /CapHeight %d /StemV 80 '
+            b'/FontFile2 %d 0 R >>' % (
+                ascent, -descent, ascent, self.FONT_FILE
+            )
+        )
+        yield self.FONT_FILE, self._stream_object(
+            compressed,
+            b'/Filter /FlateDecode /Length1 %d' % length
+        )
@@ -1,15 +1,30 @@
 from django.db import transaction
-from drf_extra_fields.fields import Base64ImageField
-from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
-from recipes.models import (Ingredient, IngredientInRecipe, Recipe)
+from api import images
 from api.constants import MIN_AMOUNT
-from users.models import User, Subscription
+from api.fields import Base64ImageField
+from foodgram_backend.middleware import TimedSerializerMixin
+from recipes import shopping_list
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from users.models import Subscription, User
+
+
+def get_following_ids(request):
+    # Подписки пользователя загружаются одним запросом на весь запрос
+    # и переиспользуются всеми вложенными UserSerializer.
+    following_ids = getattr(request, '_following_ids', None)
+    if following_ids is None:
+        following_ids = set(
+            request.user.subscriptions.values_list('following_id', flat=True)
+        )
+        request._following_ids = following_ids
+    return following_ids
 
 
-class UserCreateSerializer(UserCreateSerializer):
+class UserCreateSerializer(TimedSerializerMixin, UserCreateSerializer):
     class Meta(UserCreateSerializer.Meta):
         model = User
         fields = (
@@ -18,23 +33,30 @@ class UserCreateSerializer(UserCreateSerializer):
         )
 
 
-class UserSerializer(UserSerializer):
+class UserSerializer(TimedSerializerMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = Base64ImageField(required=False)
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta(UserSerializer.Meta):
         model = User
         fields = (
             'email', 'id', 'username', 'first_name',
-            'last_name', 'is_subscribed', 'password', 'avatar'
+            'last_name', 'is_subscribed', 'password', 'avatar',
+            'avatar_variants'
         )
         extra_kwargs = {'password': {'write_only': True}}
 
+    def get_avatar_variants(self, obj):
+        return images.get_variant_urls(
+            obj.avatar, obj.avatar_variants, self.context.get('request')
+        )
+
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        return obj.followers.filter(user=request.user).exists()
+        return obj.id in get_following_ids(request)
 
 
 class SubscriptionUserSerializer(UserSerializer):
@@ -45,18 +67,28 @@ class SubscriptionUserSerializer(UserSerializer):
         fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count')
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'recipes_preview'):
+            return ShortRecipeSerializer(
+                obj.recipes_preview, many=True, context=self.context
+            ).data
         request = self.context.get('request')
         limit = request.query_params.get('recipes_limit')
         recipes = obj.recipes.all()
         if limit:
             recipes = recipes[:int(limit)]
-        return ShortRecipeSerializer(recipes, many=True).data
+        return ShortRecipeSerializer(
+            recipes, many=True, context=self.context
+        ).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     class Meta:
         model = Subscription
         fields = ('user', 'author')
@@ -84,7 +116,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         ).data
 
 
-class AvatarSerializer(serializers.ModelSerializer):
+class AvatarSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     avatar = Base64ImageField(required=True)
 
     class Meta:
@@ -92,7 +124,9 @@ class AvatarSerializer(serializers.ModelSerializer):
         fields = ('avatar',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     class Meta:
         model = Ingredient
         fields = '__all__'
@@ -111,7 +145,9 @@ class IngredientInRecipeCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class IngredientInRecipeReadSerializer(serializers.ModelSerializer):
+class IngredientInRecipeReadSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     id = serializers.ReadOnlyField(source='ingredient.id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
@@ -124,13 +160,26 @@ class IngredientInRecipeReadSerializer(serializers.ModelSerializer):
         read_only_fields = ('amount',)
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+class ImageVariantsMixin:
+    def get_image_variants(self, obj):
+        return images.get_variant_urls(
+            obj.image, obj.image_variants, self.context.get('request')
+        )
+
+
+class ShortRecipeSerializer(
+    TimedSerializerMixin, ImageVariantsMixin, serializers.ModelSerializer
+):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
-class RecipeCreateSerializer(serializers.ModelSerializer):
+class RecipeCreateSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     ingredients = IngredientInRecipeCreateSerializer(many=True)
     image = Base64ImageField()
     author = UserSerializer(read_only=True)
@@ -197,8 +246,13 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients')
+        old_amounts = shopping_list.get_recipe_amounts(instance)
         instance.ingredient_amounts.all().delete()
         self._set_ingredients(instance, ingredients_data)
+        shopping_list.apply_recipe_change(instance, old_amounts, {
+            item['ingredient'].id: item['amount']
+            for item in ingredients_data
+        })
         return super().update(instance, validated_data)
 
     def _set_ingredients(self, recipe, ingredients_data):
@@ -215,7 +269,9 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(
+    TimedSerializerMixin, ImageVariantsMixin, serializers.ModelSerializer
+):
     ingredients = IngredientInRecipeReadSerializer(
         source='ingredient_amounts',
         many=True,
@@ -223,6 +279,9 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     author = UserSerializer(read_only=True)
     image = Base64ImageField(required=True)
+    # Уменьшенные копии фото появляются после фоновой обработки,
+    # до этого поле пустое и клиент использует image
+    image_variants = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -230,19 +289,34 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_variants',
+            'text', 'cooking_time', 'favorites_count', 'in_carts_count'
         )
         read_only_fields = ('id', 'author', 'is_favorited',
-                            'is_in_shopping_cart')
+                            'is_in_shopping_cart', 'favorites_count',
+                            'in_carts_count')
 
-    def get_is_favorited(self, obj):
+    def _get_relation_flag(self, obj, annotation, related_name):
+        # RecipeViewSet аннотирует флаги в основном запросе,
+        # отдельный запрос выполняется только без аннотации.
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        return obj.favorites.filter(user=request.user).exists()
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
+        return getattr(obj, related_name).filter(user=request.user).exists()
+
+    def get_is_favorited(self, obj):
+        return self._get_relation_flag(obj, 'is_favorited', 'favorites')
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return obj.in_cart.filter(user=request.user).exists() 
\ No newline at end of file
+        return self._get_relation_flag(obj, 'is_in_shopping_cart', 'in_cart')
+
+
+class TrendingRecipeSerializer(RecipeSerializer):
+    # Аннотации RecipeViewSet.trending из рейтинга (TrendingRecipe)
+    rank = serializers.IntegerField(source='trending_rank', read_only=True)
+    score = serializers.FloatField(source='trending_score', read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('rank', 'score')
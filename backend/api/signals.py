@@ -0,0 +1,135 @@
+import threading
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from foodgram_backend.signals import rows_changed
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+)
+from users.models import Subscription, User
+from . import images
+from .caching import (
+    bump_count_version,
+    bump_ingredients_version,
+    bump_recipes_version,
+)
+from .ingredient_index import ingredient_index
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=User)
+def invalidate_recipes_cache(sender, **kwargs):
+    bump_recipes_version()
+
+
+# Таблицы, по которым пагинация кэширует число строк (get_count)
+COUNTED_MODELS = (Recipe, User, Favorite, ShoppingCart, Subscription)
+
+
+# Таблицы, версии которых уже подняты текущим удалением. Collector
+# отправляет pre_delete для всех строк каскада до первого post_delete,
+# поэтому набор начинается заново с каждым вызовом delete().
+_deleted_tables = threading.local()
+
+
+def start_counted_delete(sender, **kwargs):
+    _deleted_tables.tables = set()
+
+
+def invalidate_counts(sender, created=True, **kwargs):
+    # Изменение строки не меняет их число
+    if not created:
+        return
+    bump_count_version(sender._meta.db_table)
+
+
+def invalidate_deleted_counts(sender, **kwargs):
+    # При каскадном удалении версия каждой таблицы меняется один раз
+    table = sender._meta.db_table
+    tables = getattr(_deleted_tables, 'tables', None)
+    if tables is not None and table in tables:
+        return
+    bump_count_version(table)
+    if tables is not None:
+        tables.add(table)
+
+
+for model in COUNTED_MODELS:
+    post_save.connect(invalidate_counts, sender=model)
+    pre_delete.connect(start_counted_delete, sender=model)
+    post_delete.connect(invalidate_deleted_counts, sender=model)
+
+
+# Модели, строки которых входят в ответы с рецептами
+RECIPE_MODELS = (Recipe, IngredientInRecipe, Ingredient)
+
+
+@receiver(rows_changed)
+def invalidate_bulk_changes(sender, count_changed=False, **kwargs):
+    if sender in RECIPE_MODELS:
+        bump_recipes_version()
+    if sender is Ingredient:
+        invalidate_ingredients(sender)
+    if count_changed:
+        bump_count_version(sender._meta.db_table)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    # Версия входит в ETag ответов /api/ingredients/, поэтому
+    # переименование или смена единицы измерения меняют валидатор
+    bump_ingredients_version()
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created, **kwargs):
+    # Новые ингредиенты еще не входят ни в один рецепт
+    if created:
+        return
+    Recipe.objects.filter(ingredients=instance).update(
+        updated_at=timezone.now()
+    )
+    bump_recipes_version()
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, update_fields=None, **kwargs):
+    # Обновление last_login при входе не меняет данные рецептов
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    # Данные автора входят в ответ рецепта, поэтому его изменение
+    # должно менять ETag рецептов
+    Recipe.objects.filter(author=instance).update(updated_at=timezone.now())
+    bump_recipes_version()
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, raw=False, **kwargs):
+    if not raw and images.needs_processing(
+        instance.image, instance.image_variants
+    ):
+        images.schedule(
+            images.process_recipe_image, [instance.pk], instance.image.name
+        )
+
+
+@receiver(post_save, sender=User)
+def process_avatar(sender, instance, raw=False, **kwargs):
+    if not raw and images.needs_processing(
+        instance.avatar, instance.avatar_variants
+    ):
+        images.schedule(
+            images.process_avatar, [instance.pk], instance.avatar.name
+        )
@@ -0,0 +1,12 @@
+from django.urls import include, path
+
+from api import async_views
+
+# Маршруты с ASYNC_READ_VIEWS = True без перезагрузки api.urls
+urlpatterns = [
+    path('api/recipes/', async_views.recipe_list),
+    path('api/recipes/<int:pk>/', async_views.recipe_detail),
+    path('api/recipes/<int:pk>/short/', async_views.short_link),
+    path('api/ingredients/', async_views.ingredient_list),
+    path('', include('foodgram_backend.urls')),
+]
@@ -0,0 +1,111 @@
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import resolve
+from django.utils.encoding import iri_to_uri
+from rest_framework.authtoken.models import Token
+
+from api import async_views
+from api.tests.utils import (
+    NO_CACHE,
+    create_ingredients,
+    create_recipe,
+    create_user,
+    get_client,
+)
+from recipes.models import Favorite, ShoppingCart
+
+HEADERS = (
+    'Content-Type', 'ETag', 'Vary', 'Last-Modified', 'WWW-Authenticate'
+)
+ASYNC_URLS = override_settings(ROOT_URLCONF='api.tests.async_urls')
+
+
+@NO_CACHE
+class AsyncViewsParityTests(TestCase):
+    """Асинхронные представления отвечают так же, как синхронные."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.author = create_user('author')
+        cls.inactive = create_user('inactive', is_active=False)
+        ingredients = create_ingredients(3)
+        cls.recipes = [
+            create_recipe(
+                cls.author if index % 2 else cls.user, ingredients,
+                name=f'Рецепт {index}'
+            )
+            for index in range(5)
+        ]
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[1])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[2])
+        cls.auths = {
+            'anonymous': None,
+            'user': f'Token {Token.objects.create(user=cls.user).key}',
+            'inactive': (
+                f'Token {Token.objects.create(user=cls.inactive).key}'
+            ),
+            'bad token': 'Token bad',
+            'no token': 'Token',
+            'spaces': 'Token a b',
+        }
+
+    @ASYNC_URLS
+    def get_async(self, view, path, authorization):
+        self.assertIs(resolve(path.partition('?')[0]).func, view)
+        headers = {}
+        if authorization:
+            headers['Authorization'] = authorization
+        return async_to_sync(AsyncClient().get)(path, headers=headers)
+
+    def get_sync(self, path, authorization):
+        client = get_client()
+        if authorization:
+            client.credentials(HTTP_AUTHORIZATION=authorization)
+        return client.get(path)
+
+    def assertSameResponse(self, view, path):
+        # Клиенты передают кириллицу в строке запроса закодированной
+        path = iri_to_uri(path)
+        for name, authorization in self.auths.items():
+            with self.subTest(path=path, auth=name):
+                expected = self.get_sync(path, authorization)
+                response = self.get_async(view, path, authorization)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+                for header in HEADERS:
+                    self.assertEqual(
+                        response.get(header), expected.get(header), header
+                    )
+
+    def test_recipe_list(self):
+        author = self.author.pk
+        for query in (
+            '', '?page=2&limit=2', '?page=last&limit=2', '?page=99',
+            '?page=abc', f'?author={author}', '?author=999999',
+            '?author=abc', '?is_favorited=1', '?is_favorited=false',
+            '?is_in_shopping_cart=true&limit=1', '?is_favorited=maybe',
+            '?search=Рецепт 3', '?ordering=-favorites_count',
+            '?ordering=bogus',
+        ):
+            self.assertSameResponse(
+                async_views.recipe_list, f'/api/recipes/{query}'
+            )
+
+    def test_recipe_detail(self):
+        for pk in (self.recipes[1].pk, 999999):
+            self.assertSameResponse(
+                async_views.recipe_detail, f'/api/recipes/{pk}/'
+            )
+
+    def test_short_link(self):
+        for pk in (self.recipes[0].pk, 999999):
+            self.assertSameResponse(
+                async_views.short_link, f'/api/recipes/{pk}/short/'
+            )
+
+    def test_ingredient_list(self):
+        for query in ('', '?name=ингредиент 1', '?name=нет'):
+            self.assertSameResponse(
+                async_views.ingredient_list, f'/api/ingredients/{query}'
+            )
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.http import http_date
+
+from api.tests.utils import (
+    NO_CACHE,
+    create_ingredients,
+    create_recipe,
+    create_user,
+    get_client,
+)
+from recipes.models import Recipe
+
+
+@NO_CACHE
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.recipe = create_recipe(cls.user, name='Старый')
+        cls.other = create_recipe(cls.user, name='Новый')
+
+    def test_last_modified_only_for_anonymous_detail(self):
+        detail = f'/api/recipes/{self.recipe.pk}/'
+        self.assertIn('Last-Modified', get_client().get(detail))
+        for client, path in (
+            (get_client(self.user), detail),
+            (get_client(), '/api/recipes/'),
+            (get_client(self.user), '/api/recipes/'),
+        ):
+            response = client.get(path)
+            self.assertIn('ETag', response)
+            self.assertNotIn('Last-Modified', response)
+
+    def test_if_modified_since_ignored_after_delete(self):
+        client = get_client()
+        latest = Recipe.objects.latest('updated_at').updated_at
+        since = http_date(latest.timestamp() + 60)
+        self.other.delete()
+        response = client.get('/api/recipes/', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_etag_not_modified(self):
+        client = get_client(self.user)
+        path = f'/api/recipes/{self.recipe.pk}/'
+        etag = client.get(path)['ETag']
+        response = client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class IngredientEtagTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredient, = create_ingredients(1)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_etag_changes_after_ingredient_update(self):
+        client = get_client()
+        for path in (
+            f'/api/ingredients/{self.ingredient.pk}/',
+            '/api/ingredients/?format=json',
+            '/api/ingredients/?name=ингр',
+        ):
+            with self.subTest(path=path):
+                etag = client.get(path)['ETag']
+                self.ingredient.measurement_unit += 'x'
+                self.ingredient.save()
+                response = client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
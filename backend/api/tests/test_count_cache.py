@@ -0,0 +1,177 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from api.caching import aget_count, estimate_count, get_count
+from api.tests.utils import create_recipe, create_user, get_client
+from foodgram_backend.signals import rows_changed
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+
+class GetCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.other = create_user('other')
+        for index in range(3):
+            create_recipe(cls.author, name=f'Рецепт {index}')
+        create_recipe(cls.other, name='Чужой')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached(self):
+        queryset = Recipe.objects.filter(author=self.author)
+        self.assertEqual(get_count(queryset).count, 3)
+        with self.assertNumQueries(0):
+            counted = get_count(queryset)
+        self.assertEqual(counted.count, 3)
+        self.assertTrue(counted.exact)
+
+    def test_key_ignores_ordering_and_annotations(self):
+        get_count(Recipe.objects.filter(author=self.author))
+        with self.assertNumQueries(0):
+            counted = get_count(
+                Recipe.objects.filter(author=self.author)
+                .select_related('author').order_by('-pub_date')
+            )
+        self.assertEqual(counted.count, 3)
+
+    def test_different_filters_are_counted_separately(self):
+        self.assertEqual(
+            get_count(Recipe.objects.filter(author=self.author)).count, 3
+        )
+        self.assertEqual(
+            get_count(Recipe.objects.filter(author=self.other)).count, 1
+        )
+
+    def test_create_and_delete_invalidate_count(self):
+        queryset = Recipe.objects.filter(author=self.author)
+        version = get_count(queryset).version
+        recipe = create_recipe(self.author, name='Новый')
+        counted = get_count(queryset)
+        self.assertEqual(counted.count, 4)
+        self.assertNotEqual(counted.version, version)
+        recipe.delete()
+        self.assertEqual(get_count(queryset).count, 3)
+
+    def test_update_keeps_count_version(self):
+        queryset = Recipe.objects.filter(author=self.author)
+        version = get_count(queryset).version
+        recipe = Recipe.objects.filter(author=self.author).first()
+        recipe.name = 'Переименован'
+        recipe.save()
+        self.assertEqual(get_count(queryset).version, version)
+
+    def test_rows_changed_signal_invalidates_count(self):
+        queryset = Recipe.objects.filter(author=self.author)
+        get_count(queryset)
+        Recipe.objects.bulk_create([Recipe(
+            author=self.author, name='Загружен', text='Описание',
+            cooking_time=10, image='recipes/test.jpg'
+        )])
+        self.assertEqual(get_count(queryset).count, 3)
+        rows_changed.send(sender=Recipe, count_changed=True)
+        self.assertEqual(get_count(queryset).count, 4)
+
+    def test_joined_tables_are_versioned(self):
+        user = create_user('user')
+        queryset = Recipe.objects.filter(favorites__user=user)
+        self.assertEqual(get_count(queryset).count, 0)
+        Favorite.objects.create(user=user, recipe=Recipe.objects.first())
+        self.assertEqual(get_count(queryset).count, 1)
+
+    def test_cascade_bumps_each_table_once_per_delete(self):
+        user = create_user('user')
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=recipe)
+            for recipe in Recipe.objects.all()
+        )
+        with mock.patch('api.signals.bump_count_version') as bump:
+            user.delete()
+        self.assertEqual(sorted(call.args[0] for call in bump.mock_calls), [
+            Favorite._meta.db_table, User._meta.db_table
+        ])
+
+    def test_each_delete_call_bumps_version(self):
+        recipe = Recipe.objects.first()
+        favorites = Favorite.objects.filter(user=self.other)
+        Favorite.objects.create(user=self.other, recipe=recipe)
+        with mock.patch('api.signals.bump_count_version') as bump:
+            favorites.delete()
+            Favorite.objects.create(user=self.other, recipe=recipe)
+            # Тот же queryset удаляет новую строку
+            favorites.delete()
+        self.assertEqual(bump.call_count, 3)
+
+    def test_empty_result_is_zero_without_query(self):
+        with self.assertNumQueries(0):
+            counted = get_count(Recipe.objects.filter(pk__in=[]))
+        self.assertEqual(counted.count, 0)
+        self.assertTrue(counted.exact)
+
+    def test_estimate_needs_postgresql(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest('Оценка доступна в PostgreSQL')
+        self.assertIsNone(estimate_count(Recipe.objects.all()))
+
+    @override_settings(PAGINATION_ESTIMATE_THRESHOLD=100)
+    def test_large_unfiltered_table_uses_estimate(self):
+        with mock.patch('api.caching.estimate_count', return_value=500):
+            self.assertEqual(
+                get_count(Recipe.objects.all()), (500, False, mock.ANY)
+            )
+            # С фильтром оценка не применяется
+            self.assertEqual(
+                get_count(Recipe.objects.filter(author=self.author)),
+                (3, True, mock.ANY)
+            )
+            response = get_client().get('/api/recipes/')
+        self.assertEqual(response.data['count'], 500)
+        self.assertIs(response.data['count_exact'], False)
+
+    @override_settings(PAGINATION_ESTIMATE_THRESHOLD=1000)
+    def test_small_table_is_counted_exactly(self):
+        with mock.patch('api.caching.estimate_count', return_value=500):
+            self.assertEqual(get_count(Recipe.objects.all()).count, 4)
+
+    def test_async_shares_cache_with_sync(self):
+        queryset = Recipe.objects.filter(author=self.author)
+        counted = get_count(queryset)
+        with self.assertNumQueries(0):
+            self.assertEqual(async_to_sync(aget_count)(queryset), counted)
+
+
+class CursorEtagTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.recipes = [
+            create_recipe(cls.author, name=f'Рецепт {index}')
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_request_does_not_count(self):
+        with mock.patch('api.views.get_count') as get_count_mock:
+            response = get_client().get('/api/recipes/?cursor=')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        get_count_mock.assert_not_called()
+
+    def test_cursor_etag_changes_after_delete(self):
+        client = get_client()
+        etag = client.get('/api/recipes/?cursor=')['ETag']
+        # Удаляется не последний измененный рецепт, Max(updated_at) прежний
+        self.recipes[0].delete()
+        response = client.get('/api/recipes/?cursor=', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
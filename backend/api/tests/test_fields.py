@@ -0,0 +1,108 @@
+import base64
+import io
+from unittest import mock
+
+from django.test import SimpleTestCase
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.fields import Base64ImageField
+
+
+def encode_image(size=(4, 3), image_format='PNG', prefix=True):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 100, 50)).save(buffer, image_format)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    if prefix:
+        return f'data:image/{image_format.lower()};base64,{data}'
+    return data
+
+
+class Base64ImageFieldTests(SimpleTestCase):
+
+    def field(self, **kwargs):
+        return Base64ImageField(**{
+            'max_size': 1024 ** 2, 'max_dimension': 100,
+            'max_pixels': 5000, **kwargs
+        })
+
+    def assertFails(self, field, data, code):
+        with self.assertRaises(ValidationError) as context:
+            field.to_internal_value(data)
+        self.assertEqual(context.exception.detail[0].code, code)
+
+    def test_decodes_supported_formats(self):
+        for image_format, extension in (
+            ('PNG', 'png'), ('JPEG', 'jpg'), ('GIF', 'gif'), ('WEBP', 'webp')
+        ):
+            with self.subTest(image_format):
+                file = self.field().to_internal_value(
+                    encode_image(image_format=image_format)
+                )
+                self.assertTrue(file.name.endswith(f'.{extension}'))
+                self.assertEqual(Image.open(file).size, (4, 3))
+
+    def test_accepts_multi_picture_jpeg(self):
+        buffer = io.BytesIO()
+        image = Image.new('RGB', (4, 3), (200, 100, 50))
+        image.save(buffer, 'MPO', save_all=True, append_images=[image])
+        file = self.field().to_internal_value(
+            base64.b64encode(buffer.getvalue()).decode()
+        )
+        self.assertEqual(file.content_type, 'image/jpeg')
+        self.assertTrue(file.name.endswith('.jpg'))
+
+    def test_without_data_url_prefix_and_with_whitespace(self):
+        data = encode_image(prefix=False)
+        data = '\n'.join(
+            data[index:index + 10] for index in range(0, len(data), 10)
+        )
+        file = self.field().to_internal_value(data)
+        self.assertEqual(file.content_type, 'image/png')
+
+    def test_decodes_in_chunks(self):
+        with mock.patch('api.fields.CHUNK_SIZE', 8):
+            file = self.field().to_internal_value(encode_image((50, 50)))
+        self.assertEqual(Image.open(file).size, (50, 50))
+
+    def test_rejects_invalid_base64(self):
+        self.assertFails(self.field(), 'data:image/png;base64,@@@@', 'invalid')
+        self.assertFails(self.field(), encode_image()[:-1], 'invalid')
+        self.assertFails(self.field(), 42, 'invalid')
+
+    def test_rejects_unknown_format(self):
+        data = base64.b64encode(b'%PDF-1.4 not an image').decode()
+        self.assertFails(self.field(), data, 'invalid_format')
+
+    def test_rejects_mismatched_content(self):
+        # Сигнатура PNG, дальше мусор
+        data = base64.b64encode(b'\x89PNG\r\n\x1a\n' + b'0' * 64).decode()
+        self.assertFails(self.field(), data, 'invalid_image')
+
+    def test_rejects_large_payload_before_decoding(self):
+        field = self.field(max_size=100)
+        with mock.patch.object(field, '_decode') as decode:
+            self.assertFails(field, encode_image((60, 60)), 'too_large')
+        decode.assert_not_called()
+
+    def test_rejects_dimensions_from_header(self):
+        self.assertFails(
+            self.field(), encode_image((101, 10)), 'too_many_pixels'
+        )
+        self.assertFails(
+            self.field(), encode_image((90, 90)), 'too_many_pixels'
+        )
+
+    def test_closes_file_on_error(self):
+        files = []
+        original = Base64ImageField._decode
+
+        def decode(field, data, offset, file):
+            files.append(file)
+            return original(field, data, offset, file)
+
+        with mock.patch.object(Base64ImageField, '_decode', decode):
+            self.assertFails(
+                self.field(), encode_image((101, 10)), 'too_many_pixels'
+            )
+        self.assertTrue(files[0].closed)
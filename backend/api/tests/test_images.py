@@ -0,0 +1,58 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api import images
+from api.tests.utils import create_recipe, create_user
+from recipes.models import Recipe
+
+
+class ScheduleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), (200, 100, 50)).save(buffer, 'JPEG')
+        self.image = default_storage.save(
+            'recipes/photo.jpg', ContentFile(buffer.getvalue())
+        )
+
+    def test_processing_goes_to_pool_by_default(self):
+        executor = mock.Mock()
+        with mock.patch.object(
+            images, '_get_executor', return_value=executor
+        ), self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(self.user, image=self.image)
+        executor.submit.assert_called_once_with(
+            images._run_in_worker, images.process_recipe_image,
+            [recipe.pk], self.image
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, {})
+
+    def test_run_synchronously_builds_variants(self):
+        with images.run_synchronously(), self.captureOnCommitCallbacks(
+            execute=True
+        ):
+            recipe = create_recipe(self.user, image=self.image)
+        variants = Recipe.objects.get(pk=recipe.pk).image_variants
+        self.assertEqual(variants['source'], self.image)
+        self.assertEqual(
+            set(variants) - {'source'}, set(images.RECIPE_VARIANTS)
+        )
+        with default_storage.open(variants['card']['jpeg']) as file:
+            self.assertEqual(Image.open(file).size, (480, 360))
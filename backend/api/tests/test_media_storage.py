@@ -0,0 +1,117 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api.tests.utils import create_recipe, create_user
+from foodgram_backend.storage import ContentAddressedStorage
+
+CONTENT = b'image bytes'
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+DAY = 24 * 3600
+
+
+class TemporaryMediaMixin:
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def make_old(self, name, age=2 * DAY):
+        path = default_storage.path(name)
+        timestamp = time.time() - age
+        os.utime(path, (timestamp, timestamp))
+        return os.path.getmtime(path)
+
+
+class ContentAddressedStorageTests(TemporaryMediaMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.storage = ContentAddressedStorage(location=self.media_root)
+
+    def test_name_is_content_hash(self):
+        name = self.storage.save('recipes/Photo.JPG', ContentFile(CONTENT))
+        self.assertEqual(name, f'recipes/{DIGEST[:2]}/{DIGEST}.jpg')
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), CONTENT)
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save('recipes/a.jpg', ContentFile(CONTENT))
+        second = self.storage.save('recipes/b.jpg', ContentFile(CONTENT))
+        other = self.storage.save('recipes/c.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(
+            self.storage.listdir(f'recipes/{DIGEST[:2]}')[1],
+            [f'{DIGEST}.jpg']
+        )
+
+    def test_hashed_name_is_kept(self):
+        name = self.storage.save('recipes/a.png', ContentFile(CONTENT))
+        self.assertEqual(self.storage.save(name, ContentFile(CONTENT)), name)
+
+    def test_reuse_refreshes_modified_time(self):
+        name = self.storage.save('recipes/a.jpg', ContentFile(CONTENT))
+        path = self.storage.path(name)
+        old = time.time() - 2 * DAY
+        os.utime(path, (old, old))
+        self.storage.save('recipes/b.jpg', ContentFile(CONTENT))
+        self.assertGreater(os.path.getmtime(path), old + DAY)
+
+
+class CollectMediaGarbageTests(TemporaryMediaMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('user')
+        self.used = default_storage.save(
+            'recipes/used.jpg', ContentFile(b'used')
+        )
+        self.variant = default_storage.save(
+            'variants/x.webp', ContentFile(b'variant')
+        )
+        create_recipe(
+            self.user, image=self.used,
+            image_variants={
+                'source': self.used, 'card': {'webp': self.variant}
+            }
+        )
+        self.orphan = default_storage.save(
+            'recipes/orphan.jpg', ContentFile(b'orphan')
+        )
+        self.young_orphan = default_storage.save(
+            'users/avatars/young.jpg', ContentFile(b'young')
+        )
+        for name in (self.used, self.variant, self.orphan):
+            self.make_old(name)
+
+    def collect(self, *args):
+        call_command('collect_media_garbage', *args, stdout=StringIO())
+
+    def test_removes_only_old_orphans(self):
+        self.collect()
+        self.assertFalse(default_storage.exists(self.orphan))
+        for name in (self.used, self.variant, self.young_orphan):
+            self.assertTrue(default_storage.exists(name))
+
+    def test_dry_run_keeps_files(self):
+        self.collect('--dry-run')
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_reused_orphan_is_kept(self):
+        # Запрос загрузил те же байты, но еще не сохранил запись
+        default_storage.save('recipes/again.jpg', ContentFile(b'orphan'))
+        self.collect()
+        self.assertTrue(default_storage.exists(self.orphan))
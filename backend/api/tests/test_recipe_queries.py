@@ -0,0 +1,67 @@
+from django.test import TestCase
+
+from api.tests.utils import (
+    NO_CACHE,
+    create_ingredients,
+    create_recipe,
+    create_user,
+    get_client,
+)
+
+RECIPES = 8
+INGREDIENTS_PER_RECIPE = 12
+
+
+@NO_CACHE
+class RecipeQueryCountTests(TestCase):
+    """Число запросов не зависит от числа рецептов и ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        ingredients = create_ingredients(INGREDIENTS_PER_RECIPE * 2)
+        cls.recipes = [
+            create_recipe(
+                cls.author,
+                ingredients[index:index + INGREDIENTS_PER_RECIPE],
+                name=f'Рецепт {index}'
+            )
+            for index in range(RECIPES)
+        ]
+
+    def get(self, client, path, queries):
+        with self.assertNumQueries(queries):
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_anonymous_list(self):
+        # COUNT и Max(updated_at) для ETag, COUNT пагинации (кэш
+        # отключен), рецепты с авторами, ингредиенты с Ingredient
+        response = self.get(get_client(), '/api/recipes/?limit=6', 5)
+        results = response.json()['results']
+        self.assertEqual(len(results), 6)
+        self.assertEqual(
+            len(results[0]['ingredients']), INGREDIENTS_PER_RECIPE
+        )
+
+    def test_authenticated_list(self):
+        # Плюс токен, состояние пользователя для ETag и его подписки
+        self.get(get_client(self.reader), '/api/recipes/?limit=6', 8)
+
+    def test_anonymous_detail(self):
+        self.get(get_client(), f'/api/recipes/{self.recipes[0].pk}/', 3)
+
+    def test_authenticated_detail(self):
+        self.get(
+            get_client(self.reader), f'/api/recipes/{self.recipes[0].pk}/',
+            6
+        )
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        client = get_client(self.reader)
+        with self.assertNumQueries(8):
+            client.get('/api/recipes/?limit=2')
+        with self.assertNumQueries(8):
+            client.get(f'/api/recipes/?limit={RECIPES}')
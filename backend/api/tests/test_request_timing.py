@@ -0,0 +1,55 @@
+from django.test import TestCase, override_settings
+from rest_framework.serializers import BaseSerializer
+
+from api.tests.utils import (
+    NO_CACHE,
+    create_ingredients,
+    create_recipe,
+    create_user,
+    get_client,
+)
+from recipes.models import ShoppingCart
+
+
+@NO_CACHE
+@override_settings(REQUEST_TIMING_ENABLED=True)
+class RequestTimingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        recipe = create_recipe(cls.user, create_ingredients(3))
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def test_server_timing_header(self):
+        response = get_client().get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        header = response['Server-Timing']
+        for metric in ('db;', 'serializer;', 'view;', 'total;'):
+            self.assertIn(metric, header)
+        timings = response.wsgi_request.timings
+        self.assertEqual(timings.view_name, 'RecipeViewSet.list')
+        self.assertGreater(timings.serializer, 0)
+
+    def test_streamed_queries_are_logged(self):
+        client = get_client(self.user)
+        with self.assertLogs('foodgram_backend.middleware') as logs:
+            response = client.get(
+                '/api/recipes/download_shopping_cart/?format=csv'
+            )
+            header_queries = self.header_queries(response)
+            self.assertEqual(logs.records, [])
+            b''.join(response.streaming_content)
+        record, = logs.records
+        self.assertEqual(record.view, 'RecipeViewSet.download_shopping_cart')
+        # Строки списка читаются при передаче тела
+        self.assertGreater(record.queries, header_queries)
+
+    def test_serializers_are_not_patched(self):
+        get_client().get('/api/recipes/')
+        self.assertFalse(hasattr(BaseSerializer.data.fget, 'timed'))
+
+    @staticmethod
+    def header_queries(response):
+        db = response['Server-Timing'].split(',')[0]
+        return int(db.split('desc="')[1].split()[0])
@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from pypdf import PdfReader
+
+from api.renderers import PDFShoppingListRenderer
+from api.tests.utils import (
+    create_ingredients,
+    create_recipe,
+    create_user,
+    get_client,
+)
+from recipes.models import ShoppingCart
+
+ROWS = [
+    ('Мука пшеничная', 'г', 500),
+    ('Яйца (куриные)', 'шт', 3),
+    ('Соль\\перец', 'г', 5),
+]
+
+
+def render_pdf(rows):
+    content = b''.join(PDFShoppingListRenderer().stream(rows))
+    return PdfReader(io.BytesIO(content), strict=True)
+
+
+class PDFShoppingListRendererTests(SimpleTestCase):
+
+    def test_text_is_extractable(self):
+        text = render_pdf(ROWS).pages[0].extract_text()
+        self.assertEqual(text.splitlines(), [
+            'Мука пшеничная (г) - 500',
+            'Яйца (куриные) (шт) - 3',
+            'Соль\\перец (г) - 5',
+        ])
+
+    def test_rows_split_into_pages(self):
+        per_page = PDFShoppingListRenderer.lines_per_page
+        rows = [
+            (f'Продукт {index}', 'г', index)
+            for index in range(per_page * 2 + 1)
+        ]
+        reader = render_pdf(rows)
+        self.assertEqual(len(reader.pages), 3)
+        self.assertEqual(
+            reader.pages[0].extract_text().splitlines()[-1],
+            f'Продукт {per_page - 1} (г) - {per_page - 1}'
+        )
+        self.assertEqual(
+            reader.pages[2].extract_text().splitlines(),
+            [f'Продукт {per_page * 2} (г) - {per_page * 2}']
+        )
+
+    def test_font_is_embedded(self):
+        font = render_pdf(ROWS).pages[0]['/Resources']['/Font']['/F1']
+        self.assertIn('/FontFile2', font['/FontDescriptor'])
+
+    @override_settings(SHOPPING_LIST_PDF_FONT='')
+    def test_without_font_file(self):
+        font = render_pdf(ROWS).pages[0]['/Resources']['/Font']['/F1']
+        self.assertNotIn('/FontDescriptor', font)
+        self.assertIn('Мука', render_pdf(ROWS).pages[0].extract_text())
+
+
+class ShoppingCartDownloadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.empty = create_user('empty')
+        ingredients = create_ingredients(2)
+        for name in ('Первый', 'Второй'):
+            recipe = create_recipe(cls.user, ingredients, name=name)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def download(self, user, query=''):
+        return get_client(user).get(
+            f'/api/recipes/download_shopping_cart/{query}'
+        )
+
+    def test_formats(self):
+        expected = [('ингредиент 0', 'г', 20), ('ингредиент 1', 'г', 20)]
+        response = self.download(self.user, '?format=csv')
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertEqual(
+            list(csv.reader(io.StringIO(content)))[1:],
+            [[name, unit, str(amount)] for name, unit, amount in expected]
+        )
+        response = self.download(self.user, '?format=json')
+        self.assertEqual(
+            json.loads(b''.join(response.streaming_content)),
+            [
+                {'name': name, 'measurement_unit': unit, 'amount': amount}
+                for name, unit, amount in expected
+            ]
+        )
+        response = self.download(self.user, '?format=pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        reader = PdfReader(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIn('ингредиент 1 (г) - 20', reader.pages[0].extract_text())
+
+    def test_errors_are_json(self):
+        for user, query, status in (
+            (self.empty, '', 400),
+            (self.empty, '?format=pdf', 400),
+            (None, '?format=csv', 401),
+        ):
+            response = self.download(user, query)
+            self.assertEqual(response.status_code, status)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertTrue(response.json())
+        self.assertEqual(
+            self.download(self.empty).json(),
+            {'error': 'Список покупок пуст'}
+        )
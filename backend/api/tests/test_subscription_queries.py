@@ -0,0 +1,79 @@
+from django.test import TestCase
+
+from api.tests.utils import NO_CACHE, create_recipe, create_user, get_client
+from recipes.models import Recipe
+from users.models import Subscription
+
+AUTHORS = 5
+RECIPES_PER_AUTHOR = 4
+
+
+@NO_CACHE
+class SubscriptionQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.authors = [
+            create_user(f'author{index}') for index in range(AUTHORS)
+        ]
+        for author in cls.authors:
+            for index in range(RECIPES_PER_AUTHOR):
+                create_recipe(author, name=f'{author.username} {index}')
+            Subscription.objects.create(user=cls.reader, following=author)
+
+    def get_subscriptions(self, query, queries):
+        client = get_client(self.reader)
+        with self.assertNumQueries(queries):
+            response = client.get(f'/api/users/subscriptions/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_subscriptions_do_not_query_per_author(self):
+        # Токен, COUNT, авторы со счетчиками, превью рецептов
+        # одним запросом и подписки читателя для is_subscribed
+        results = self.get_subscriptions('?recipes_limit=2', 5)
+        self.assertEqual(len(results), AUTHORS)
+        for author in results:
+            self.assertTrue(author['is_subscribed'])
+            self.assertEqual(author['recipes_count'], RECIPES_PER_AUTHOR)
+            self.assertEqual(len(author['recipes']), 2)
+
+    def test_previews_without_limit_return_all_recipes(self):
+        results = self.get_subscriptions('', 5)
+        self.assertEqual(
+            [len(author['recipes']) for author in results],
+            [RECIPES_PER_AUTHOR] * AUTHORS
+        )
+
+    def test_previews_follow_recipe_ordering(self):
+        results = self.get_subscriptions('?recipes_limit=3', 5)
+        for author in results:
+            names = [recipe['name'] for recipe in author['recipes']]
+            self.assertEqual(names, sorted(names))
+
+    def test_is_subscribed_loaded_once_for_user_list(self):
+        client = get_client(self.reader)
+        # Токен, COUNT, пользователи и подписки читателя
+        with self.assertNumQueries(4):
+            response = client.get('/api/users/?limit=10')
+        subscribed = {
+            user['username']: user['is_subscribed']
+            for user in response.json()['results']
+        }
+        self.assertFalse(subscribed['reader'])
+        self.assertTrue(all(
+            subscribed[author.username] for author in self.authors
+        ))
+
+    def test_preview_variant_urls_are_absolute(self):
+        Recipe.objects.update(image_variants={
+            'source': 'recipes/test.jpg',
+            'thumbnail': {'webp': 'variants/ab/ab.webp'},
+        })
+        results = self.get_subscriptions('?recipes_limit=1', 5)
+        variants = results[0]['recipes'][0]['image_variants']
+        self.assertEqual(
+            variants['thumbnail']['webp'],
+            'http://testserver/media/variants/ab/ab.webp'
+        )
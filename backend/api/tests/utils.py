@@ -0,0 +1,47 @@
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from users.models import User
+
+# Без кэша число запросов не зависит от предыдущих запросов теста
+NO_CACHE = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+})
+
+
+def create_user(username, **kwargs):
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username,
+        first_name=username, last_name=username, password='password',
+        **kwargs
+    )
+
+
+def create_ingredients(count, prefix='ингредиент'):
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'{prefix} {index}', measurement_unit='г')
+        for index in range(count)
+    )
+
+
+def create_recipe(author, ingredients=(), name='Рецепт',
+                  image='recipes/test.jpg', **kwargs):
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание', cooking_time=10,
+        image=image, **kwargs
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=10)
+        for ingredient in ingredients
+    )
+    return recipe
+
+
+def get_client(user=None):
+    client = APIClient()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
@@ -1,11 +1,13 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from . import async_views
 from .views import (
     IngredientViewSet,
     RecipeViewSet,
     UserProfileViewSet,
-    copy_short_link
+    copy_short_link,
 )
 
 app_name = 'api'
@@ -15,7 +17,26 @@ router.register('users', UserProfileViewSet, basename='users')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 
-urlpatterns = [
+urlpatterns = []
+if settings.ASYNC_READ_VIEWS:
+    # Маршруты роутера с теми же именами, но асинхронными представлениями;
+    # остальные методы эти представления передают ViewSet'ам
+    urlpatterns += [
+        path('recipes/', async_views.recipe_list, name='recipes-list'),
+        path(
+            'recipes/<int:pk>/', async_views.recipe_detail,
+            name='recipes-detail'
+        ),
+        path(
+            'recipes/<int:pk>/short/', async_views.short_link,
+            name='recipe_short_link'
+        ),
+        path(
+            'ingredients/', async_views.ingredient_list,
+            name='ingredients-list'
+        ),
+    ]
+urlpatterns += [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
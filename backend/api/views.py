@@ -1,37 +1,102 @@
 import logging
 
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Prefetch, Window
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from rest_framework import viewsets, permissions, status
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action, api_view
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from recipes import counters
 from recipes.models import (
     Favorite,
     Ingredient,
     IngredientInRecipe,
     Recipe,
-    ShoppingCart
+    ShoppingCart,
+    ShoppingListItem,
+    TrendingRecipe,
 )
 from users.models import User
-from .filters import IngredientSearchFilter, RecipeFilter
-from .pagination import Pagination
+from .caching import (
+    get_cached_response_data,
+    get_count,
+    get_ingredients_version,
+    get_queryset_version,
+    get_recipes_cache_key,
+    get_recipes_version,
+    get_tables_version,
+    set_cached_response_data,
+)
+from .conditional import (
+    get_last_modified,
+    get_not_modified_response,
+    get_user_state,
+    make_etag,
+    set_conditional_headers,
+)
+from .filters import (
+    IngredientSearchFilter,
+    RecipeFilter,
+    RecipeOrderingFilter,
+    TextSearchFilter,
+)
+from .ingredient_index import ingredient_index
+from .pagination import Pagination, RankPagination
 from .permissions import IsAuthorOrReadOnly
+from .renderers import (
+    CSVShoppingListRenderer,
+    JSONShoppingListRenderer,
+    PDFShoppingListRenderer,
+    TextShoppingListRenderer,
+)
 from .serializers import (
+    AvatarSerializer,
     IngredientSerializer,
-    RecipeSerializer,
     RecipeCreateSerializer,
+    RecipeSerializer,
     ShortRecipeSerializer,
-    UserSerializer,
     SubscriptionUserSerializer,
-    AvatarSerializer
+    TrendingRecipeSerializer,
+    UserSerializer,
 )
 
 logger = logging.getLogger(__name__)
 
+SHOPPING_LIST_CHUNK_SIZE = 2000
+
+
+def get_recipes_queryset(user):
+    # Общий для RecipeViewSet и асинхронных представлений (async_views)
+    queryset = Recipe.objects.all().select_related(
+        'author'
+    ).defer(
+        'search_vector'
+    ).prefetch_related(
+        Prefetch(
+            'ingredient_amounts',
+            queryset=IngredientInRecipe.objects.select_related(
+                'ingredient'
+            )
+        )
+    )
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
+    return queryset
+
+
 @api_view(['GET'])
 def copy_short_link(request, pk):
     recipe = get_object_or_404(Recipe, id=pk)
@@ -44,6 +109,7 @@ class UserProfileViewSet(DjoserUserViewSet):
     pagination_class = Pagination
     serializer_class = UserSerializer
     queryset = User.objects.all().order_by('id')
+    cursor_ordering = ('id',)
     lookup_field = 'id'
     lookup_url_kwarg = 'id'
 
@@ -93,7 +159,9 @@ class UserProfileViewSet(DjoserUserViewSet):
                 status=status.HTTP_200_OK
             )
         if user.avatar:
-            user.avatar.delete()
+            # Файл может быть общим с другими записями, его удалит
+            # collect_media_garbage, когда ссылок не останется
+            user.avatar = None
             user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -107,8 +175,11 @@ class UserProfileViewSet(DjoserUserViewSet):
     def subscriptions(self, request):
         followed_users = User.objects.filter(
             followers__user=request.user
-        ).order_by('id')
+        ).annotate(recipes_count=Count('recipes')).order_by('id')
         page = self.paginate_queryset(followed_users)
+        self._attach_recipes_preview(
+            page, request.query_params.get('recipes_limit')
+        )
         serializer = SubscriptionUserSerializer(
             page,
             many=True,
@@ -116,6 +187,24 @@ class UserProfileViewSet(DjoserUserViewSet):
         )
         return self.get_paginated_response(serializer.data)
 
+    def _attach_recipes_preview(self, authors, limit):
+        # Первые recipes_limit рецептов всех авторов страницы выбираются
+        # одним запросом с ROW_NUMBER() по каждому автору.
+        authors_by_id = {author.id: author for author in authors}
+        for author in authors:
+            author.recipes_preview = []
+        recipes = Recipe.objects.filter(author_id__in=authors_by_id)
+        if limit and limit.isdigit():
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=Recipe._meta.ordering,
+                )
+            ).filter(row_number__lte=int(limit))
+        for recipe in recipes:
+            authors_by_id[recipe.author_id].recipes_preview.append(recipe)
+
     @action(
         methods=['post', 'delete'],
         detail=True,
@@ -133,7 +222,7 @@ class UserProfileViewSet(DjoserUserViewSet):
                 )
 
             subscription, created = author.followers.get_or_create(user=user)
-            
+
             if not created:
                 return Response(
                     {'error': 'Вы уже подписаны на этого пользователя'},
@@ -164,31 +253,153 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
-    filter_backends = (IngredientSearchFilter,)
+    filter_backends = (IngredientSearchFilter, TextSearchFilter)
     search_fields = ("^name",)
+    text_search_fields = ('name',)
+    trigram_search_field = 'name'
+
+    def _conditional_response(self, handler, request, *args, **kwargs):
+        # Число строк и последний id отражают выборку, а версия,
+        # которую меняют сигналы Ingredient, - правки существующих строк.
+        queryset = self.filter_queryset(self.get_queryset())
+        if 'pk' in kwargs:
+            queryset = queryset.filter(pk=kwargs['pk'])
+        state = queryset.aggregate(count=Count('id'), last_id=Max('id'))
+        etag = make_etag(
+            request, state['count'], state['last_id'],
+            get_ingredients_version()
+        )
+        response = get_not_modified_response(request, etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            set_conditional_headers(response, etag)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # Автодополнение обслуживается индексом в памяти без запросов
+        # к базе; прочие параметры (например, format) идут обычным путем.
+        if set(request.query_params) - {IngredientSearchFilter.search_param}:
+            return self._conditional_response(
+                super().list, request, *args, **kwargs
+            )
+        content, state = ingredient_index.search(
+            request.query_params.get(IngredientSearchFilter.search_param, '')
+        )
+        etag = make_etag(request, *state)
+        response = get_not_modified_response(request, etag)
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+        return set_conditional_headers(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     pagination_class = Pagination
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (
+        DjangoFilterBackend, TextSearchFilter, RecipeOrderingFilter
+    )
     filterset_class = RecipeFilter
+    ordering_fields = (
+        'favorites_count', 'in_carts_count', 'pub_date', 'name'
+    )
+    text_search_fields = ('name', 'text')
+    trigram_search_field = 'name'
+    search_vector_field = 'search_vector'
+    # Ключ курсорной пагинации, см. индекс recipe_pub_date_id_idx
+    cursor_ordering = ('-pub_date', '-id')
     permission_classes = [permissions.AllowAny]
 
     def get_queryset(self):
-        return Recipe.objects.all().select_related(
-            'author'
-        ).prefetch_related(
-            'ingredients',
-            'ingredient_amounts'
-        )
+        return get_recipes_queryset(self.request.user)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({'request': self.request})
         return context
 
+    def _cached_response(self, handler, request, *args, **kwargs):
+        key = get_recipes_cache_key(request, kwargs.get('pk'))
+        if key is None:
+            return handler(request, *args, **kwargs)
+        data = get_cached_response_data(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_cached_response_data(key, response.data)
+        return response
+
+    def _conditional_response(self, handler, request, *args, **kwargs):
+        # ETag строится по числу рецептов и последней дате изменения,
+        # ответ 304 отдается до запуска сериализации.
+        queryset = self.filter_queryset(Recipe.objects.all())
+        if 'pk' in kwargs:
+            queryset = queryset.filter(pk=kwargs['pk'])
+            state = queryset.aggregate(
+                count=Count('id'), last_modified=Max('updated_at')
+            )
+        elif self.paginator.cursor_query_param in request.query_params:
+            # Курсорной странице число строк не нужно: добавления и
+            # удаления отражают версии таблиц запроса, правки - updated_at
+            state = queryset.aggregate(last_modified=Max('updated_at'))
+            state['count'] = get_queryset_version(queryset)
+        else:
+            # Для списка число строк берется из того же кэша, что и
+            # у пагинации, версии таблиц отражают удаления
+            counted = get_count(queryset)
+            state = queryset.aggregate(last_modified=Max('updated_at'))
+            state['count'] = (counted.count, counted.version)
+        # Счетчики избранного и корзин обновляют и updated_at, но версии
+        # их таблиц различают изменения в пределах одной отметки времени
+        etag = make_etag(
+            request, state['count'], state['last_modified'],
+            get_tables_version(counters.COUNTERS),
+            get_user_state(request.user)
+        )
+        last_modified = get_last_modified(
+            request, state['last_modified'], 'pk' in kwargs
+        )
+        response = get_not_modified_response(request, etag, last_modified)
+        if response is None:
+            response = self._cached_response(
+                handler, request, *args, **kwargs
+            )
+        if response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            set_conditional_headers(response, etag, last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Рендереры списка покупок только отдают файл потоком, ошибки
+        # этого действия возвращаются в JSON, как в остальном API
+        if (
+            self.action == 'download_shopping_cart'
+            and isinstance(response, Response)
+        ):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
             return [IsAuthorOrReadOnly()]
@@ -197,14 +408,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RecipeCreateSerializer
+        if self.action == 'trending':
+            return TrendingRecipeSerializer
         return RecipeSerializer
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
     def _handle_relation(self, request, recipe, model, serializer_class):
+        # Строка связи и счетчик рецепта (recipes.counters, через сигналы)
+        # меняются в одной транзакции
         obj = model.objects.filter(user=request.user, recipe=recipe).first()
-        
+
         if request.method == "POST":
             if obj:
                 return Response(
@@ -250,36 +466,66 @@ class RecipeViewSet(viewsets.ModelViewSet):
             request, recipe, ShoppingCart, ShortRecipeSerializer
         )
 
+    @action(
+        methods=["get"],
+        detail=False,
+        pagination_class=RankPagination,
+        url_path="trending",
+    )
+    def trending(self, request):
+        # Места берутся из рейтинга, который пересчитывает команда
+        # refresh_trending; таблицы избранного и корзин не читаются
+        queryset = self.get_queryset().filter(
+            trend__isnull=False
+        ).annotate(
+            trending_rank=F('trend__rank'),
+            trending_score=F('trend__score'),
+        ).order_by('trend__rank')
+        etag = make_etag(
+            request, get_recipes_version(),
+            get_tables_version((TrendingRecipe, *counters.COUNTERS)),
+            get_user_state(request.user)
+        )
+        response = get_not_modified_response(request, etag)
+        if response is None:
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+        return set_conditional_headers(response, etag)
+
     @action(
         methods=["get"],
         detail=False,
         permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=[
+            TextShoppingListRenderer,
+            CSVShoppingListRenderer,
+            JSONShoppingListRenderer,
+            PDFShoppingListRenderer,
+        ],
         url_path="download_shopping_cart",
     )
     def download_shopping_cart(self, request):
-        recipes = Recipe.objects.filter(in_cart__user=request.user)
-        ingredients = (
-            IngredientInRecipe.objects.filter(recipe__in=recipes)
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(total_amount=Sum("amount"))
-            .order_by("ingredient__name")
-        )
+        # Суммы поддерживаются инкрементально в ShoppingListItem
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
+        ).order_by("ingredient__name")
 
-        if not ingredients:
+        if not ingredients.exists():
             return Response(
                 {'error': 'Список покупок пуст'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        shopping_list = []
-        for item in ingredients:
-            name = item["ingredient__name"]
-            unit = item["ingredient__measurement_unit"]
-            amount = item["total_amount"]
-            shopping_list.append(f"{name} ({unit}) - {amount}")
-
-        content = "\n".join(shopping_list)
-        filename = "shopping_list.txt"
-        response = HttpResponse(content, content_type="text/plain")
+        # Строки читаются серверным курсором и сразу уходят клиенту,
+        # поэтому память не зависит от размера списка.
+        rows = ingredients.values_list(
+            "ingredient__name", "ingredient__measurement_unit", "total_amount"
+        ).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(rows), content_type=request.accepted_media_type
+        )
+        filename = f"shopping_list.{renderer.format}"
         response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response 
\ No newline at end of file
+        return response
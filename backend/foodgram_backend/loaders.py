@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+
+FORMATS = ('csv', 'json', 'jsonl')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension == 'ndjson':
+        return 'jsonl'
+    if extension not in FORMATS:
+        raise ValueError(f'Неизвестный формат файла: {path}')
+    return extension
+
+
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    # Элементы массива разбираются по одному, не читая файл целиком
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position == len(buffer) and not eof:
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        if not started:
+            if buffer[position:position + 1] != '[':
+                raise ValueError('Ожидался JSON-массив')
+            started = True
+            position += 1
+            continue
+        if buffer[position:position + 1] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        if end == len(buffer) and not eof:
+            # Число на границе блока могло прочитаться не полностью
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = end
+
+
+def iter_records(path, file_format=None, fields=None):
+    """Построчно читает записи из CSV, JSON-массива или JSON Lines.
+
+    Для CSV без заголовка имена колонок передаются в ``fields``.
+    """
+    file_format = file_format or detect_format(path)
+    with open(path, encoding='utf-8-sig', newline='') as file:
+        if file_format == 'csv':
+            reader = csv.reader(file)
+            for row in reader:
+                if not row or not any(row):
+                    continue
+                if fields is None:
+                    fields = row
+                    continue
+                yield dict(zip(fields, row))
+        elif file_format == 'jsonl':
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(file)
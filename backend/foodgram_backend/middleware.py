@@ -0,0 +1,156 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.view_name = None
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.serializer_depth = 0
+        self.view_started = None
+        self.view = 0.0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """Учитывает время to_representation в замерах текущего запроса.
+
+    Подключается к сериализаторам API явно. Вложенные сериализаторы
+    и элементы списка считаются в рамках внешнего вызова, чтобы время
+    не учитывалось дважды.
+    """
+
+    def to_representation(self, instance):
+        timings = _timings.get()
+        if timings is None:
+            return super().to_representation(instance)
+        timings.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serializer_depth -= 1
+            if not timings.serializer_depth:
+                timings.serializer += time.perf_counter() - started
+
+
+class RequestTimingMiddleware:
+    """Замеряет SQL-запросы, сериализацию и время обработки запроса.
+
+    Результат отдается в заголовке Server-Timing и пишется в лог
+    с именем представления DRF, например ``RecipeViewSet.list``.
+    Включается настройкой ``REQUEST_TIMING_ENABLED``; если она выключена,
+    Django убирает middleware из цепочки.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        request.timings = timings
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings.execute_wrapper):
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        if timings.view_started is not None and not timings.view:
+            timings.view = time.perf_counter() - timings.view_started
+
+        # Заголовок уходит до тела, поэтому у потокового ответа в нем
+        # только запросы до начала передачи; строка лога пишется после
+        # передачи и учитывает запросы итератора
+        response['Server-Timing'] = self.format_header(
+            timings, time.perf_counter() - started
+        )
+        if response.streaming:
+            response.streaming_content = self.measure_stream(
+                response.streaming_content, request, response, timings,
+                started
+            )
+        else:
+            self.log(request, response, timings, started)
+        return response
+
+    @staticmethod
+    def format_header(timings, total):
+        return ', '.join((
+            f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} q"',
+            f'serializer;dur={timings.serializer * 1000:.1f}',
+            f'view;dur={timings.view * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+    def measure_stream(self, content, request, response, timings, started):
+        try:
+            with connection.execute_wrapper(timings.execute_wrapper):
+                yield from content
+        finally:
+            self.log(request, response, timings, started)
+
+    @staticmethod
+    def log(request, response, timings, started):
+        total = time.perf_counter() - started
+        logger.info(
+            'view=%s method=%s status=%s queries=%d db_ms=%.1f '
+            'serializer_ms=%.1f view_ms=%.1f total_ms=%.1f',
+            timings.view_name, request.method, response.status_code,
+            timings.queries, timings.db * 1000, timings.serializer * 1000,
+            timings.view * 1000, total * 1000,
+            extra={
+                'view': timings.view_name,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': timings.queries,
+                'db_ms': round(timings.db * 1000, 1),
+                'serializer_ms': round(timings.serializer * 1000, 1),
+                'view_ms': round(timings.view * 1000, 1),
+                'total_ms': round(total * 1000, 1),
+            }
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = request.timings
+        view_class = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None)
+        if view_class is not None and actions:
+            action = actions.get(request.method.lower(), request.method)
+            timings.view_name = f'{view_class.__name__}.{action}'
+        elif view_class is not None:
+            timings.view_name = view_class.__name__
+        else:
+            timings.view_name = getattr(
+                view_func, '__name__', type(view_func).__name__
+            )
+        timings.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся после этого хука, поэтому здесь
+        # заканчивается время работы представления.
+        timings = request.timings
+        if timings.view_started is not None:
+            timings.view = time.perf_counter() - timings.view_started
+        return response
@@ -36,6 +36,9 @@ DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '127.0.0.1,localhost').split(',')
 
+# Per-request SQL and timing instrumentation (Server-Timing header + log line)
+REQUEST_TIMING_ENABLED = os.getenv('REQUEST_TIMING_ENABLED', 'False') == 'True'
+
 
 # Application definition
 
@@ -46,6 +49,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -58,6 +62,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram_backend.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -103,6 +108,45 @@ DATABASES = {
 }
 
 
+# Cache
+# With several gunicorn workers use a shared backend (file-based or Redis),
+# otherwise invalidation only reaches the worker that handled the write.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Anonymous recipe list/detail responses, invalidated by a version counter
+RECIPES_CACHE_TIMEOUT = int(os.getenv('RECIPES_CACHE_TIMEOUT', '300'))
+
+# Cached COUNT(*) for paginated lists, invalidated on row create/delete;
+# unfiltered tables above the threshold use the Postgres reltuples estimate
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', '60')
+)
+PAGINATION_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_ESTIMATE_THRESHOLD', '100000')
+)
+
+# Per-worker ingredient autocomplete index, rebuilt at most this often
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', '300'))
+
+# Async views for recipe/ingredient reads (api.async_views); pays off
+# only under an ASGI server, see ASGI_SERVER in script.sh
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
+
+# TrueType font with Cyrillic glyphs embedded into shopping list PDFs
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -144,6 +188,33 @@ STATICFILES_DIRS = []
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'foodgram_backend.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Ограничения для картинок в base64 (api.fields); размер совпадает
+# с client_max_body_size в nginx
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', str(10 * 1024 ** 2))
+)
+IMAGE_UPLOAD_MAX_DIMENSION = int(
+    os.getenv('IMAGE_UPLOAD_MAX_DIMENSION', '8000')
+)
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.getenv('IMAGE_UPLOAD_MAX_PIXELS', '40000000')
+)
+
+# Фоновая обработка загруженных картинок (api.images)
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', '2'))
+IMAGE_VARIANT_FORMATS = os.getenv(
+    'IMAGE_VARIANT_FORMATS', 'avif,webp,jpeg'
+).split(',')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
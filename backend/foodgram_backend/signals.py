@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+# Строки модели ``sender`` изменены в обход save() и delete()
+# (bulk_create, update, обновление материализованного представления).
+# count_changed=True, если строки добавлены или удалены. Кэши ответов
+# по этому сигналу сбрасывает api.signals.
+rows_changed = Signal()
@@ -0,0 +1,41 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файлы под именем из SHA-256 их содержимого.
+
+    Файл сохраняется как ``<каталог upload_to>/<2 символа>/<хеш>.<ext>``;
+    одинаковые загрузки получают одно и то же имя и записываются на диск
+    один раз. Поэтому файлы нельзя удалять вместе с объектом: на них
+    могут ссылаться другие записи, осиротевшие файлы удаляет команда
+    collect_media_garbage.
+    """
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        target = self.get_hashed_name(name, digest.hexdigest())
+        if self.exists(target):
+            # Новая ссылка на старый файл: время изменения обновляется,
+            # чтобы collect_media_garbage не счел его давно осиротевшим,
+            # пока ссылающаяся запись еще не сохранена
+            os.utime(self.path(target))
+            return target
+        saved = super()._save(target, content)
+        if saved != target:
+            # Тот же файл успели записать параллельно
+            self.delete(saved)
+        return target
+
+    @staticmethod
+    def get_hashed_name(name, digest):
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        # Имя, уже построенное из того же хеша, не меняется
+        if os.path.basename(directory) == digest[:2]:
+            directory = os.path.dirname(directory)
+        return os.path.join(directory, digest[:2], f'{digest}{extension}')
@@ -1,19 +1,17 @@
 from django.contrib import admin
 
 from .models import (Favorite, Ingredient, IngredientInRecipe,
-                     Recipe, ShoppingCart)
+                     Recipe, ShoppingCart, ShoppingListItem)
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author', 'favorites_count')
+    list_display = (
+        'id', 'name', 'author', 'favorites_count', 'in_carts_count'
+    )
     search_fields = ('name', 'author__username')
     list_filter = ('author', 'name')
 
-    def favorites_count(self, obj):
-        return obj.favorites.count()
-    favorites_count.short_description = 'Добавлений в избранное'
-
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -33,4 +31,10 @@ class FavoriteAdmin(admin.ModelAdmin):
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'recipe')
\ No newline at end of file
+    list_display = ('id', 'user', 'recipe')
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'total_amount')
+    search_fields = ('user__username', 'ingredient__name')
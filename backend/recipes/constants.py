@@ -2,4 +2,12 @@ INGREDIENT_NAME_MAX_LENGTH = 128
 RECIPE_NAME_MAX_LENGTH = 256
 UNIT_MAX_LENGTH = 64
 MIN_INGREDIENT_AMOUNT = 1
-MIN_COOKING_TIME = 1 
\ No newline at end of file
+MIN_COOKING_TIME = 1
+
+# Популярность: добавления за окно, вес которых убывает вдвое за
+# период полураспада. Для PostgreSQL значения зашиты в материализованное
+# представление (миграция 0009), их изменение требует новой миграции.
+TRENDING_WINDOW_DAYS = 30
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_CART_WEIGHT = 0.5
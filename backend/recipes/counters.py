@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models import (
+    Count,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce, Greatest, Now
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+# Модель связи и поле Recipe, в котором хранится число ее строк
+COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def change(model, recipe_ids, delta):
+    """Атомарно меняет счетчик ``model`` у рецептов на ``delta``."""
+    field = COUNTERS[model]
+    # updated_at меняется тем же UPDATE ради Last-Modified рецепта;
+    # кэш ответов не сбрасывается, счетчики в нем подставляются
+    # при чтении (api.caching.get_cached_response_data)
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        updated_at=Now(), **{field: Greatest(F(field) + delta, Value(0))}
+    )
+
+
+def remove_user(user):
+    # При удалении пользователя его избранное и корзина удаляются
+    # каскадом; у каждого рецепта не больше одной такой строки
+    for model in COUNTERS:
+        change(
+            model,
+            model.objects.filter(user=user).values('recipe_id'),
+            -1
+        )
+
+
+def _live_count(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(total=Count('id'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+
+
+def find_mismatches(recipe_ids=None):
+    """Рецепты, у которых счетчики расходятся с таблицами связей."""
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    condition = Q()
+    annotations = {}
+    for model, field in COUNTERS.items():
+        annotations[f'live_{field}'] = _live_count(model)
+        condition |= ~Q(**{field: F(f'live_{field}')})
+    return recipes.annotate(**annotations).filter(condition).order_by('pk')
+
+
+@transaction.atomic
+def reconcile(recipe_ids=None):
+    """Пересчитывает счетчики расходящихся рецептов одним UPDATE."""
+    drifted = list(find_mismatches(recipe_ids).values_list('pk', flat=True))
+    if drifted:
+        Recipe.objects.filter(pk__in=drifted).update(
+            updated_at=Now(),
+            **{field: _live_count(model) for model, field in COUNTERS.items()}
+        )
+    return len(drifted)
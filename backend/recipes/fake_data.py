@@ -0,0 +1,257 @@
+import io
+import random
+from bisect import bisect
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image
+
+from recipes import counters, shopping_list, trending
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+)
+from users.models import Subscription, User
+
+BATCH_SIZE = 1000
+PLACEHOLDER_IMAGE = 'recipes/fake_placeholder.jpg'
+ADDITIONS_SPREAD = timedelta(days=60)
+
+FIRST_NAMES = (
+    'Иван', 'Мария', 'Алексей', 'Анна', 'Дмитрий', 'Елена', 'Сергей',
+    'Ольга', 'Павел', 'Наталья', 'Андрей', 'Татьяна', 'Максим', 'Ирина',
+)
+LAST_NAMES = (
+    'Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов',
+    'Лебедев', 'Козлов', 'Новиков', 'Морозов', 'Волков', 'Соловьев',
+)
+DISH_ADJECTIVES = (
+    'Домашний', 'Быстрый', 'Летний', 'Острый', 'Бабушкин', 'Постный',
+    'Праздничный', 'Сытный', 'Легкий', 'Деревенский', 'Пряный',
+)
+DISHES = (
+    'борщ', 'салат', 'пирог', 'суп', 'плов', 'омлет', 'рагу', 'гуляш',
+    'соус', 'десерт', 'паштет', 'запеканка', 'кекс', 'смузи', 'хлеб',
+)
+STEPS = (
+    'Подготовьте и вымойте продукты.',
+    'Нарежьте ингредиенты небольшими кусочками.',
+    'Разогрейте сковороду и добавьте масло.',
+    'Тушите на медленном огне до готовности.',
+    'Посолите и поперчите по вкусу.',
+    'Выпекайте в разогретой духовке.',
+    'Дайте блюду настояться и подавайте.',
+)
+
+
+class ZipfChooser:
+    """Выбор элементов с вероятностью, обратной степени их ранга.
+
+    Порядок рангов перемешивается, чтобы популярность не совпадала
+    с порядком первичных ключей.
+    """
+
+    def __init__(self, items, exponent, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)
+        ))
+        self.rng = rng
+
+    def choice(self):
+        position = self.rng.random() * self.cum_weights[-1]
+        return self.items[
+            min(bisect(self.cum_weights, position), len(self.items) - 1)
+        ]
+
+
+class FakeDataGenerator:
+    """Создает пользователей, рецепты и связи между ними пачками.
+
+    Авторство, популярность рецептов и ингредиентов и активность
+    пользователей распределены по закону Ципфа; при одинаковых
+    ``seed`` и таблице ингредиентов данные получаются одинаковыми.
+    Сигналы при bulk_create не отправляются, поэтому списки покупок
+    пересобираются в конце.
+    """
+
+    def __init__(self, seed=42, prefix='fake', password='password',
+                 zipf_exponent=1.1, batch_size=BATCH_SIZE, log=None):
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.password = password
+        self.zipf_exponent = zipf_exponent
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+
+    def generate(self, users, recipes, favorites, carts, subscriptions,
+                 min_ingredients=0):
+        user_objects = self.create_users(users)
+        ingredients = self.ensure_ingredients(min_ingredients)
+        recipe_objects = self.create_recipes(
+            user_objects, ingredients, recipes
+        )
+        active_users = ZipfChooser(
+            user_objects, self.zipf_exponent, self.rng
+        )
+        popular_recipes = ZipfChooser(
+            recipe_objects, self.zipf_exponent, self.rng
+        )
+        popular_authors = ZipfChooser(
+            user_objects, self.zipf_exponent, self.rng
+        )
+        # Даты добавлений разбросаны шире окна рейтинга популярности
+        self.create_pairs(
+            Favorite, 'user', 'recipe', active_users, popular_recipes,
+            favorites, spread=ADDITIONS_SPREAD
+        )
+        self.create_pairs(
+            ShoppingCart, 'user', 'recipe', active_users, popular_recipes,
+            carts, spread=ADDITIONS_SPREAD
+        )
+        self.create_pairs(
+            Subscription, 'user', 'following', active_users,
+            popular_authors, subscriptions
+        )
+        shopping_list.rebuild([user.id for user in user_objects])
+        # bulk_create не отправляет сигналы, обновляющие счетчики
+        counters.reconcile([recipe.id for recipe in recipe_objects])
+        trending.refresh()
+        return {
+            'users': user_objects,
+            'ingredients': ingredients,
+            'recipes': recipe_objects,
+        }
+
+    def create_users(self, count):
+        password = make_password(self.password)
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f'{self.prefix}{index}',
+                    email=f'{self.prefix}{index}@example.com',
+                    first_name=self.rng.choice(FIRST_NAMES),
+                    last_name=self.rng.choice(LAST_NAMES),
+                    password=password,
+                )
+                for index in range(count)
+            ],
+            batch_size=self.batch_size
+        )
+        self.log(f'Created {len(users)} users')
+        return users
+
+    def ensure_ingredients(self, count):
+        ingredients = list(Ingredient.objects.order_by('id'))
+        if len(ingredients) < count:
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(
+                        name=f'{self.prefix} ингредиент {index}',
+                        measurement_unit='г'
+                    )
+                    for index in range(count - len(ingredients))
+                ],
+                batch_size=self.batch_size
+            )
+            ingredients = list(Ingredient.objects.order_by('id'))
+        return ingredients
+
+    def get_placeholder_image(self):
+        # Хранилище называет файлы по содержимому, повторная
+        # генерация вернет тот же файл
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 400), (214, 122, 64)).save(
+            buffer, format='JPEG'
+        )
+        return default_storage.save(
+            PLACEHOLDER_IMAGE, ContentFile(buffer.getvalue())
+        )
+
+    def create_recipes(self, users, ingredients, count):
+        image = self.get_placeholder_image()
+        authors = ZipfChooser(users, self.zipf_exponent, self.rng)
+        popular_ingredients = ZipfChooser(
+            ingredients, self.zipf_exponent, self.rng
+        )
+        now = timezone.now()
+        recipes = []
+        for start in range(0, count, self.batch_size):
+            batch = []
+            amounts = []
+            for index in range(start, min(start + self.batch_size, count)):
+                recipe = Recipe(
+                    author=authors.choice(),
+                    name=(
+                        f'{self.rng.choice(DISH_ADJECTIVES)} '
+                        f'{self.rng.choice(DISHES)} {self.prefix}{index}'
+                    ),
+                    text=' '.join(self.rng.sample(
+                        STEPS, self.rng.randint(2, len(STEPS))
+                    )),
+                    cooking_time=self.rng.choice((5, 10, 15, 20, 30, 45,
+                                                  60, 90, 120, 180)),
+                    image=image,
+                    pub_date=now - timedelta(
+                        seconds=self.rng.randint(0, 365 * 24 * 3600)
+                    ),
+                )
+                batch.append(recipe)
+                # Обычно в рецепте 5-12 ингредиентов
+                size = min(
+                    max(round(self.rng.gauss(8, 3)), 2), 20, len(ingredients)
+                )
+                chosen = set()
+                while len(chosen) < size:
+                    chosen.add(popular_ingredients.choice().id)
+                amounts.append(chosen)
+            Recipe.objects.bulk_create(batch)
+            IngredientInRecipe.objects.bulk_create([
+                IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.choice((1, 2, 5, 10, 50, 100, 200, 500)),
+                )
+                for recipe, chosen in zip(batch, amounts)
+                for ingredient_id in sorted(chosen)
+            ])
+            recipes.extend(batch)
+        self.log(f'Created {len(recipes)} recipes')
+        return recipes
+
+    def create_pairs(self, model, left, right, lefts, rights, count,
+                     spread=None):
+        # Из-за перекоса распределения часть пар повторяется,
+        # поэтому число попыток ограничено
+        pairs = set()
+        attempts = 0
+        while len(pairs) < count and attempts < count * 5:
+            attempts += 1
+            pair = (lefts.choice().id, rights.choice().id)
+            if model is not Subscription or pair[0] != pair[1]:
+                pairs.add(pair)
+        now = timezone.now()
+        extra = {}
+        objects = []
+        for left_id, right_id in sorted(pairs):
+            if spread is not None:
+                extra['created_at'] = now - timedelta(
+                    seconds=self.rng.randint(0, int(spread.total_seconds()))
+                )
+            objects.append(model(
+                **{f'{left}_id': left_id, f'{right}_id': right_id}, **extra
+            ))
+        model.objects.bulk_create(
+            objects,
+            batch_size=self.batch_size,
+            ignore_conflicts=True
+        )
+        self.log(f'Created {len(pairs)} {model.__name__} rows')
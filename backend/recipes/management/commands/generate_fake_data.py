@@ -0,0 +1,112 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from foodgram_backend.signals import rows_changed
+from recipes.fake_data import FakeDataGenerator
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+)
+from users.models import Subscription, User
+
+COUNTS = {
+    'users': 1000,
+    'recipes': 10000,
+    'favorites': 50000,
+    'carts': 20000,
+    'subscriptions': 20000,
+}
+DUMP_MODELS = (
+    'users.User', 'users.Subscription', 'recipes.Ingredient',
+    'recipes.Recipe', 'recipes.IngredientInRecipe', 'recipes.Favorite',
+    'recipes.ShoppingCart', 'recipes.ShoppingListItem',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, рецептами, '
+        'избранным, корзинами и подписками для нагрузочного тестирования'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in COUNTS.items():
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Количество при --scale 1 (по умолчанию {default})'
+            )
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help='Множитель для всех количеств'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--prefix', default='fake',
+            help='Префикс имен пользователей и рецептов'
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Пароль всех созданных пользователей'
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1, dest='zipf_exponent',
+            help='Показатель распределения Ципфа'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dump',
+            help='Сохранить данные в фикстуру для loaddata (.json, .json.gz)'
+        )
+
+    def handle(self, *args, **options):
+        counts = {
+            name: max(round(options[name] * options['scale']), 0)
+            for name in COUNTS
+        }
+        if counts['users'] < 2 or counts['recipes'] < 1:
+            raise CommandError('Нужны хотя бы 2 пользователя и 1 рецепт')
+        if not Ingredient.objects.exists():
+            raise CommandError(
+                'Таблица ингредиентов пуста, выполните load_ingredients'
+            )
+        if User.objects.filter(
+            username__startswith=options['prefix']
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {options["prefix"]} уже есть, '
+                'укажите другой --prefix'
+            )
+
+        started = time.perf_counter()
+        generator = FakeDataGenerator(
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+            zipf_exponent=options['zipf_exponent'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        with transaction.atomic():
+            generator.generate(**counts)
+        # bulk_create не отправляет post_save
+        for model in (
+            User, Ingredient, Recipe, IngredientInRecipe, Favorite,
+            ShoppingCart, Subscription,
+        ):
+            rows_changed.send(sender=model, count_changed=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated dataset in {time.perf_counter() - started:.1f}s'
+        ))
+
+        if options['dump']:
+            call_command(
+                'dumpdata', *DUMP_MODELS, output=options['dump'],
+                verbosity=0
+            )
+            self.stdout.write(f'Dump saved to {options["dump"]}')
@@ -1,31 +1,125 @@
-import json
+import io
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from foodgram_backend.loaders import FORMATS, iter_records
+from foodgram_backend.signals import rows_changed
 from recipes.models import Ingredient
 
+DEFAULT_PATH = 'data/ingredients.csv'
+CSV_FIELDS = ('name', 'measurement_unit')
+
 
 class Command(BaseCommand):
-    help = 'Загрузка ингредиентов из recipes/ingredients.json'
-
-    def handle(self, *args, **kwargs):
-        with open('data/ingredients.json', encoding='utf-8') as file:
-            data = json.load(file)
-            created_count = 0
-            skipped_count = 0
-            
-            for item in data:
-                _, created = Ingredient.objects.get_or_create(
-                    name=item['name'],
-                    measurement_unit=item['measurement_unit']
-                )
-                if created:
-                    created_count += 1
-                else:
-                    skipped_count += 1
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Successfully loaded {created_count} ingredients. '
-                    f'Skipped {skipped_count} existing ingredients.'
-                )
-            )
\ No newline at end of file
+    help = (
+        'Загрузка ингредиентов из CSV или JSON; уже существующие '
+        'пары (название, единица измерения) пропускаются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument(
+            '--format', choices=FORMATS, dest='file_format',
+            help='По умолчанию определяется по расширению файла'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        use_copy = (
+            not options['no_copy'] and connection.vendor == 'postgresql'
+        )
+        write_batch = self._copy_batch if use_copy else self._create_batch
+
+        read_count = created_count = 0
+        batch = []
+        try:
+            with transaction.atomic():
+                seen = set(Ingredient.objects.values_list(
+                    'name', 'measurement_unit'
+                ))
+                for item in iter_records(
+                    options['path'], options['file_format'], CSV_FIELDS
+                ):
+                    read_count += 1
+                    key = (
+                        item['name'].strip(),
+                        item['measurement_unit'].strip()
+                    )
+                    if not all(key) or key in seen:
+                        continue
+                    seen.add(key)
+                    batch.append(key)
+                    if len(batch) >= batch_size:
+                        created_count += write_batch(batch)
+                        batch = []
+                if batch:
+                    created_count += write_batch(batch)
+        except FileNotFoundError:
+            raise CommandError(f'Файл {options["path"]} не найден')
+        except (KeyError, AttributeError, ValueError) as error:
+            raise CommandError(
+                f'Некорректные данные в {options["path"]}: {error}'
+            )
+        if created_count:
+            # bulk_create и COPY не отправляют post_save
+            rows_changed.send(sender=Ingredient)
+
+        elapsed = time.perf_counter() - started
+        rate = read_count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {created_count} ingredients, skipped '
+            f'{read_count - created_count} of {read_count} rows '
+            f'in {elapsed:.2f}s ({rate:.0f} rows/s, '
+            f'{"COPY" if use_copy else "bulk_create"})'
+        ))
+
+    @staticmethod
+    def _create_batch(batch):
+        # ignore_conflicts защищает от параллельного запуска команды;
+        # число созданных строк при этом может быть завышено.
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in batch
+            ],
+            ignore_conflicts=True
+        )
+        return len(batch)
+
+    @staticmethod
+    def _copy_batch(batch):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        buffer = io.StringIO()
+        for row in batch:
+            buffer.write('\t'.join(
+                value.replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r')
+                for value in row
+            ) + '\n')
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS ingredient_load '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            cursor.execute('TRUNCATE ingredient_load')
+            cursor.copy_expert(
+                'COPY ingredient_load (name, measurement_unit) FROM STDIN',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT name, measurement_unit FROM ingredient_load '
+                'ON CONFLICT DO NOTHING'
+            )
+            return cursor.rowcount
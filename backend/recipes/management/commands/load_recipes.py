@@ -1,133 +1,260 @@
-import json 
-import os 
-from django.core.management.base import BaseCommand 
-from django.core.files import File 
-from recipes.models import Recipe, Ingredient, IngredientInRecipe 
-from users.models import User 
- 
- 
-class Command(BaseCommand): 
-    help = 'Load recipes from data/recipes.json' 
- 
-    def handle(self, *args, **kwargs): 
-        try: 
-            with open('data/recipes.json', 'r', encoding='utf-8') as file: 
-                data = json.load(file) 
-                for item in data: 
-                    try: 
-                        author = User.objects.get(username=item['author']) 
-                        self.stdout.write(f"\nProcessing recipe: {item['name']}")
-                         
-                        recipe = Recipe.objects.filter( 
-                            name=item['name'], 
-                            author=author 
-                        ).first() 
- 
-                        if recipe: 
-                            recipe.text = item['text'] 
-                            recipe.cooking_time = item['cooking_time'] 
-                            recipe.save() 
-                             
-                            recipe.ingredient_amounts.all().delete() 
-                            action = "Updated" 
-                        else: 
-                            recipe = Recipe.objects.create( 
-                                name=item['name'], 
-                                text=item['text'], 
-                                cooking_time=item['cooking_time'], 
-                                author=author 
-                            ) 
-                            action = "Created" 
- 
-                        # Обрабатываем изображение 
-                        # Используем путь к изображению как есть, относительно data/
-                        image_path = os.path.join('data', item['image'])
-                        self.stdout.write(f"Looking for image at: {image_path}")
-                        if os.path.exists(image_path): 
-                            self.stdout.write(f"Found image file: {image_path}")
-                            with open(image_path, 'rb') as img_file: 
-                                # Сохраняем только имя файла, без пути photos/
-                                image_name = os.path.basename(item['image'])
-                                recipe.image.save( 
-                                    image_name, 
-                                    File(img_file), 
-                                    save=True 
-                                ) 
-                                self.stdout.write(f"Saved image as {image_name}")
-                        else:
-                            self.stdout.write(
-                                self.style.WARNING(
-                                    f"Image file not found: {image_path}"
-                                )
-                            )
- 
-                        # Добавляем ингредиенты 
-                        self.stdout.write("\nProcessing ingredients:")
-                        for ingredient_item in item['ingredients']: 
-                            ingredient_name = ingredient_item['name'].strip()
-                            self.stdout.write(f"\nLooking for ingredient: {ingredient_name}")
-                            try:
-                                # Сначала пробуем точное совпадение
-                                ingredient = Ingredient.objects.get(name=ingredient_name)
-                                self.stdout.write(f"Found ingredient in DB: {ingredient.name} (id: {ingredient.id})")
-                                
-                                # Проверяем, не был ли уже добавлен этот ингредиент
-                                existing = IngredientInRecipe.objects.filter(
-                                    recipe=recipe,
-                                    ingredient=ingredient
-                                ).first()
-                                
-                                if existing:
-                                    self.stdout.write(f"Ingredient already added to recipe: {ingredient.name}")
-                                else:
-                                    IngredientInRecipe.objects.create( 
-                                        recipe=recipe, 
-                                        ingredient=ingredient, 
-                                        amount=ingredient_item['amount'] 
-                                    ) 
-                                    self.stdout.write(f"Added ingredient to recipe: {ingredient.name} ({ingredient_item['amount']})")
-                            except Ingredient.DoesNotExist:
-                                self.stdout.write(
-                                    self.style.ERROR(
-                                        f'Ingredient not found: {ingredient_name}'
-                                    )
-                                )
-                                # Показываем похожие ингредиенты
-                                similar = Ingredient.objects.filter(name__icontains=ingredient_name.split()[0])
-                                if similar:
-                                    self.stdout.write("Similar ingredients found:")
-                                    for s in similar:
-                                        self.stdout.write(f"- {s.name}")
-                                # Удаляем рецепт, если не нашли ингредиент
-                                recipe.delete()
-                                raise Exception(f'Required ingredient not found: {ingredient_name}')
- 
-                        self.stdout.write( 
-                            self.style.SUCCESS( 
-                                f'{action} recipe {recipe.name}' 
-                            ) 
-                        ) 
-                    except User.DoesNotExist: 
-                        self.stdout.write( 
-                            self.style.ERROR( 
-                                f'Author {item["author"]} not found' 
-                            ) 
-                        ) 
-                    except Exception as e: 
-                        self.stdout.write( 
-                            self.style.ERROR( 
-                                f'Failed to process recipe {item["name"]}: {e}' 
-                            ) 
-                        ) 
-        except FileNotFoundError: 
-            self.stdout.write( 
-                self.style.ERROR( 
-                    'File data/recipes.json not found' 
-                ) 
-            ) 
-        except json.JSONDecodeError: 
-            self.stdout.write( 
-                self.style.ERROR( 
-                    'Invalid JSON in data/recipes.json' 
-                ) 
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from foodgram_backend.loaders import iter_records
+from foodgram_backend.signals import rows_changed
+from recipes import shopping_list
+from recipes.constants import (
+    MIN_COOKING_TIME,
+    MIN_INGREDIENT_AMOUNT,
+    RECIPE_NAME_MAX_LENGTH,
+)
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, ShoppingCart
+from users.models import User
+
+DEFAULT_PATH = 'data/recipes.json'
+MAX_SMALL_INTEGER = 32767
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Загрузка рецептов из JSON или JSON Lines. Файл сначала '
+        'проверяется целиком, затем рецепты создаются пачками; '
+        'существующие рецепты автора с тем же названием обновляются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument(
+            '--format', choices=('json', 'jsonl'), dest='file_format',
+            help='По умолчанию определяется по расширению файла'
+        )
+        parser.add_argument(
+            '--images-dir', default='data',
+            help='Каталог, относительно которого указаны пути к фото'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Потоков для копирования изображений'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError(
+                '--chunk-size и --workers должны быть больше нуля'
             )
+        started = time.perf_counter()
+        self.images_dir = options['images_dir']
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.ingredients = {}
+        # Название ингредиента может встречаться с разными единицами,
+        # как и раньше, берется первый по id
+        for pk, name in Ingredient.objects.order_by('id').values_list(
+            'id', 'name'
+        ):
+            self.ingredients.setdefault(name, pk)
+
+        records = partial(
+            iter_records, options['path'], options['file_format']
+        )
+        try:
+            total = self.validate(records())
+            self.created = self.updated = self.images = 0
+            self.missing_images = []
+            with ThreadPoolExecutor(options['workers']) as pool:
+                rows = map(self.parse, records())
+                while chunk := list(islice(rows, options['chunk_size'])):
+                    self.load_chunk(chunk, pool)
+        except FileNotFoundError:
+            raise CommandError(f'Файл {options["path"]} не найден')
+        except ValueError as error:
+            raise CommandError(
+                f'Некорректный JSON в {options["path"]}: {error}'
+            )
+        if self.created or self.updated:
+            rows_changed.send(
+                sender=Recipe, count_changed=bool(self.created)
+            )
+
+        for path in self.missing_images:
+            self.stdout.write(self.style.WARNING(
+                f'Image file not found: {path}'
+            ))
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {self.created}, updated {self.updated} recipes, '
+            f'copied {self.images} images in {elapsed:.2f}s '
+            f'({rate:.0f} recipes/s)'
+        ))
+
+    def validate(self, records):
+        errors = []
+        seen = set()
+        total = 0
+        for number, item in enumerate(records, 1):
+            total += 1
+            try:
+                author_id, name, *_ = self.parse(item)
+            except (KeyError, TypeError, ValueError) as error:
+                errors.append(f'#{number}: {error}')
+                continue
+            if (author_id, name) in seen:
+                errors.append(
+                    f'#{number}: рецепт «{name}» автора '
+                    f'{item["author"]} встречается повторно'
+                )
+            seen.add((author_id, name))
+        if errors:
+            for error in errors[:MAX_REPORTED_ERRORS]:
+                self.stdout.write(self.style.ERROR(error))
+            raise CommandError(
+                f'Файл содержит ошибки ({len(errors)}), '
+                'рецепты не загружены'
+            )
+        return total
+
+    def parse(self, item):
+        author = item['author']
+        if author not in self.authors:
+            raise ValueError(f'автор {author} не найден')
+        name = item['name'].strip()
+        if not name or len(name) > RECIPE_NAME_MAX_LENGTH:
+            raise ValueError(f'некорректное название «{name}»')
+        cooking_time = self._small_integer(
+            item['cooking_time'], MIN_COOKING_TIME, 'cooking_time'
+        )
+        amounts = {}
+        for ingredient in item['ingredients']:
+            ingredient_name = ingredient['name'].strip()
+            if ingredient_name not in self.ingredients:
+                raise ValueError(f'ингредиент {ingredient_name} не найден')
+            # Повторы ингредиента пропускаются, как и раньше
+            amounts.setdefault(
+                self.ingredients[ingredient_name],
+                self._small_integer(
+                    ingredient['amount'], MIN_INGREDIENT_AMOUNT, 'amount'
+                )
+            )
+        if not amounts:
+            raise ValueError(f'у рецепта «{name}» нет ингредиентов')
+        return (
+            self.authors[author], name, item['text'], cooking_time,
+            item.get('image'), amounts
+        )
+
+    @staticmethod
+    def _small_integer(value, minimum, field):
+        if (
+            not isinstance(value, int) or isinstance(value, bool)
+            or not minimum <= value <= MAX_SMALL_INTEGER
+        ):
+            raise ValueError(f'некорректное значение {field}: {value}')
+        return value
+
+    def copy_image(self, image):
+        path = os.path.join(self.images_dir, image)
+        if not os.path.exists(path):
+            return None
+        field = Recipe._meta.get_field('image')
+        with open(path, 'rb') as file:
+            return field.storage.save(
+                field.generate_filename(None, os.path.basename(image)),
+                File(file)
+            )
+
+    def load_chunk(self, chunk, pool):
+        author_ids = {row[0] for row in chunk}
+        names = {row[1] for row in chunk}
+        existing = {
+            (recipe.author_id, recipe.name): recipe
+            for recipe in Recipe.objects.filter(
+                author_id__in=author_ids, name__in=names
+            ).only('id', 'author_id', 'name', 'image')
+        }
+        # Фото уже загруженных рецептов не копируются повторно,
+        # чтобы перезапуск команды не плодил файлы
+        images = {
+            (author_id, name): (image, pool.submit(self.copy_image, image))
+            for author_id, name, _, _, image, _ in chunk
+            if image and (
+                (author_id, name) not in existing
+                or not existing[author_id, name].image
+            )
+        }
+        image_names = {}
+        for key, (image, future) in images.items():
+            image_names[key] = future.result()
+            if image_names[key] is None:
+                self.missing_images.append(
+                    os.path.join(self.images_dir, image)
+                )
+        self.images += sum(1 for name in image_names.values() if name)
+
+        now = timezone.now()
+        new_recipes, updated_recipes, amounts = [], [], {}
+        for author_id, name, text, cooking_time, _, recipe_amounts in chunk:
+            key = (author_id, name)
+            recipe = existing.get(key)
+            if recipe is None:
+                recipe = Recipe(author_id=author_id, name=name)
+                new_recipes.append(recipe)
+            else:
+                recipe.updated_at = now
+                updated_recipes.append(recipe)
+            recipe.text = text
+            recipe.cooking_time = cooking_time
+            if image_names.get(key):
+                recipe.image = image_names[key]
+            amounts[key] = recipe_amounts
+
+        with transaction.atomic():
+            Recipe.objects.bulk_create(new_recipes)
+            updated_ids = [recipe.id for recipe in updated_recipes]
+            Recipe.objects.bulk_update(
+                updated_recipes,
+                ['text', 'cooking_time', 'image', 'updated_at']
+            )
+            # Изменение состава рецептов из корзин переносится
+            # в списки покупок
+            in_carts = set(
+                ShoppingCart.objects.filter(recipe_id__in=updated_ids)
+                .values_list('recipe_id', flat=True)
+            )
+            old_amounts = {recipe_id: {} for recipe_id in in_carts}
+            for recipe_id, ingredient_id, amount in (
+                IngredientInRecipe.objects.filter(recipe_id__in=in_carts)
+                .values_list('recipe_id', 'ingredient_id', 'amount')
+            ):
+                old_amounts[recipe_id][ingredient_id] = amount
+            IngredientInRecipe.objects.filter(
+                recipe_id__in=updated_ids
+            ).delete()
+            IngredientInRecipe.objects.bulk_create([
+                IngredientInRecipe(
+                    recipe_id=recipe.id, ingredient_id=ingredient_id,
+                    amount=amount
+                )
+                for recipe in new_recipes + updated_recipes
+                for ingredient_id, amount in amounts[
+                    recipe.author_id, recipe.name
+                ].items()
+            ])
+            for recipe in updated_recipes:
+                if recipe.id in in_carts:
+                    shopping_list.apply_recipe_change(
+                        recipe, old_amounts[recipe.id],
+                        amounts[recipe.author_id, recipe.name]
+                    )
+        self.created += len(new_recipes)
+        self.updated += len(updated_recipes)
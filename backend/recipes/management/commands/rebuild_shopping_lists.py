@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает таблицу списков покупок из корзин '
+        'или проверяет ее на расхождения (--verify)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя; можно указать несколько раз'
+        )
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить таблицу с живым агрегатом'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+        if not options['verify']:
+            count = shopping_list.rebuild(user_ids)
+            self.stdout.write(f'Rebuilt {count} shopping list items')
+
+        mismatches = shopping_list.find_mismatches(user_ids)
+        for (user_id, ingredient_id), (stored, live) in sorted(
+            mismatches.items()
+        ):
+            self.stdout.write(self.style.WARNING(
+                f'user {user_id}, ingredient {ingredient_id}: '
+                f'stored {stored}, live {live}'
+            ))
+        if mismatches:
+            self.stdout.write(self.style.ERROR(
+                f'Found {len(mismatches)} mismatched items'
+            ))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS('Shopping lists match live aggregate')
+            )
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from recipes import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счетчики избранного и корзин у рецептов с таблицами '
+        'связей и исправляет расхождения (или только показывает их, '
+        'с --verify)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipe', type=int, action='append', dest='recipes',
+            help='id рецепта; можно указать несколько раз'
+        )
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только показать расхождения'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        recipe_ids = options['recipes']
+        fields = list(counters.COUNTERS.values())
+        mismatches = counters.find_mismatches(recipe_ids).values_list(
+            'pk', *fields, *(f'live_{field}' for field in fields)
+        )
+        found = 0
+        for pk, *values in mismatches.iterator():
+            found += 1
+            if self.verbosity > 1 or options['verify']:
+                stored, live = values[:len(fields)], values[len(fields):]
+                self.stdout.write(self.style.WARNING(
+                    f'recipe {pk}: ' + ', '.join(
+                        f'{field} stored {old}, live {new}'
+                        for field, old, new in zip(fields, stored, live)
+                        if old != new
+                    )
+                ))
+        if not found:
+            self.stdout.write(
+                self.style.SUCCESS('Recipe counters match live tables')
+            )
+            return
+        if options['verify']:
+            self.stdout.write(self.style.ERROR(
+                f'Found {found} recipes with drifted counters'
+            ))
+            return
+        fixed = counters.reconcile(recipe_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f'Fixed counters of {fixed} recipes')
+        )
@@ -0,0 +1,52 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from foodgram_backend.signals import rows_changed
+from recipes import trending
+from recipes.models import TrendingRecipe
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг популярных рецептов '
+        '(/api/recipes/trending/); с --interval работает как '
+        'планировщик и повторяет пересчет'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Пересчитывать каждые N секунд, пока процесс не остановят'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        if interval is None:
+            self.refresh()
+            return
+        while True:
+            started = time.monotonic()
+            # Ошибка одного пересчета (например, база недоступна)
+            # не останавливает планировщик
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('Trending refresh failed')
+            finally:
+                close_old_connections()
+            time.sleep(max(interval - (time.monotonic() - started), 0))
+
+    def refresh(self):
+        started = time.perf_counter()
+        ranked = trending.refresh()
+        # Число строк и ETag рейтинга зависят от версии его таблицы
+        rows_changed.send(sender=TrendingRecipe, count_changed=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ranked {ranked} recipes '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
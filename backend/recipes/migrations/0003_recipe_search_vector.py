@@ -0,0 +1,86 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Индексы и триггер нужны только в PostgreSQL; на SQLite поиск
+# выполняется через LIKE, и эти операции пропускаются.
+FORWARD_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update()
+    """,
+    'UPDATE recipes_recipe SET name = name',
+    """
+    CREATE INDEX recipes_recipe_search_vector_gin
+    ON recipes_recipe USING gin (search_vector)
+    """,
+    # name % query (trigram_similar) использует индекс по name,
+    # icontains компилируется в UPPER(name::text) LIKE UPPER(...).
+    """
+    CREATE INDEX recipes_recipe_name_trgm
+    ON recipes_recipe USING gin (name gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX recipes_recipe_name_upper_trgm
+    ON recipes_recipe USING gin ((UPPER(name::text)) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX recipes_ingredient_name_trgm
+    ON recipes_ingredient USING gin (name gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX recipes_ingredient_name_upper_trgm
+    ON recipes_ingredient USING gin ((UPPER(name::text)) gin_trgm_ops)
+    """,
+]
+
+REVERSE_SQL = [
+    'DROP INDEX IF EXISTS recipes_ingredient_name_upper_trgm',
+    'DROP INDEX IF EXISTS recipes_ingredient_name_trgm',
+    'DROP INDEX IF EXISTS recipes_recipe_name_upper_trgm',
+    'DROP INDEX IF EXISTS recipes_recipe_name_trgm',
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+    'ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()',
+]
+
+
+def run_postgres_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_postgres_sql(FORWARD_SQL),
+            run_postgres_sql(REVERSE_SQL),
+        ),
+    ]
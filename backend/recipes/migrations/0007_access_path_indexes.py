@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['name', 'id'], name='recipe_name_id_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['author', 'name'], name='recipe_author_name_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(
+                fields=['user', '-id'], name='favorite_user_id_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(
+                fields=['user', '-id'], name='shoppingcart_user_id_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,123 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+# Значения recipes.constants.TRENDING_* на момент миграции: вес
+# добавления (1 для избранного, 0.5 для корзины) убывает вдвое каждые
+# 72 часа, добавления старше 30 дней не учитываются. Уникальный индекс
+# нужен для REFRESH MATERIALIZED VIEW CONCURRENTLY
+# (recipes.trending.refresh).
+POSTGRES_FORWARD_SQL = [
+    """
+    CREATE MATERIALIZED VIEW recipes_trending AS
+    SELECT
+        recipe_id,
+        score,
+        row_number() OVER (ORDER BY score DESC, recipe_id) AS rank
+    FROM (
+        SELECT
+            recipe_id,
+            sum(
+                weight * power(
+                    0.5,
+                    extract(epoch FROM now() - created_at)
+                    / 259200
+                )
+            ) AS score
+        FROM (
+            SELECT recipe_id, created_at,
+                1.0::double precision AS weight
+            FROM recipes_favorite
+            UNION ALL
+            SELECT recipe_id, created_at,
+                0.5::double precision AS weight
+            FROM recipes_shoppingcart
+        ) AS additions
+        WHERE created_at >= now() - interval '30 days'
+        GROUP BY recipe_id
+    ) AS scores
+    """,
+    'CREATE UNIQUE INDEX recipes_trending_recipe ON recipes_trending '
+    '(recipe_id)',
+    'CREATE INDEX recipes_trending_rank ON recipes_trending (rank)',
+]
+POSTGRES_REVERSE_SQL = [
+    'DROP MATERIALIZED VIEW IF EXISTS recipes_trending',
+]
+# В остальных СУБД рейтинг хранится в таблице, которую целиком
+# переписывает recipes.trending.refresh
+TABLE_FORWARD_SQL = [
+    """
+    CREATE TABLE recipes_trending (
+        recipe_id integer NOT NULL PRIMARY KEY,
+        score double precision NOT NULL,
+        rank integer NOT NULL
+    )
+    """,
+    'CREATE INDEX recipes_trending_rank ON recipes_trending (rank)',
+]
+TABLE_REVERSE_SQL = [
+    'DROP TABLE IF EXISTS recipes_trending',
+]
+
+
+def run_vendor_sql(postgres_statements, other_statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            statements = postgres_statements
+        else:
+            statements = other_statements
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created_at',
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now,
+                verbose_name='Дата добавления'
+            ),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created_at',
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now,
+                verbose_name='Дата добавления'
+            ),
+        ),
+        migrations.CreateModel(
+            name='TrendingRecipe',
+            fields=[
+                ('recipe', models.OneToOneField(
+                    db_constraint=False,
+                    on_delete=models.deletion.DO_NOTHING,
+                    primary_key=True,
+                    related_name='trend',
+                    serialize=False,
+                    to='recipes.recipe'
+                )),
+                ('score', models.FloatField(verbose_name='Популярность')),
+                ('rank', models.PositiveIntegerField(verbose_name='Место')),
+            ],
+            options={
+                'verbose_name': 'Популярный рецепт',
+                'verbose_name_plural': 'Популярные рецепты',
+                'db_table': 'recipes_trending',
+                'ordering': ('rank',),
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(
+            run_vendor_sql(POSTGRES_FORWARD_SQL, TABLE_FORWARD_SQL),
+            run_vendor_sql(POSTGRES_REVERSE_SQL, TABLE_REVERSE_SQL),
+        ),
+    ]
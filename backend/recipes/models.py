@@ -1,15 +1,19 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
+from django.db import models
 from django.utils import timezone
 
-from users.models import User
 from recipes.constants import (
     INGREDIENT_NAME_MAX_LENGTH,
+    MIN_COOKING_TIME,
+    MIN_INGREDIENT_AMOUNT,
     RECIPE_NAME_MAX_LENGTH,
     UNIT_MAX_LENGTH,
-    MIN_INGREDIENT_AMOUNT,
-    MIN_COOKING_TIME,
 )
+from users.models import User
+
+# Денормализованные счетчики рецепта (recipes.counters)
+COUNTER_FIELDS = ("favorites_count", "in_carts_count")
 
 
 class Ingredient(models.Model):
@@ -39,21 +43,74 @@ class Recipe(models.Model):
     )
     name = models.CharField("Название", max_length=RECIPE_NAME_MAX_LENGTH)
     image = models.ImageField("Фото", upload_to="recipes/")
+    # Уменьшенные копии фото, заполняются в фоне (api.images)
+    image_variants = models.JSONField(
+        "Варианты фото", default=dict, blank=True, editable=False
+    )
     text = models.TextField("Описание")
     cooking_time = models.PositiveSmallIntegerField(
         "Время приготовления", validators=[MinValueValidator(MIN_COOKING_TIME)]
     )
     ingredients = models.ManyToManyField(Ingredient, through="IngredientInRecipe")
     pub_date = models.DateTimeField("Дата публикации", default=timezone.now)
+    updated_at = models.DateTimeField(
+        "Дата изменения", auto_now=True, db_index=True
+    )
+    # Поддерживаются сигналами (recipes.counters), сверяются командой
+    # reconcile_recipe_counters. Меняются только атомарными UPDATE,
+    # поэтому save() их не перезаписывает (см. Recipe.save).
+    favorites_count = models.PositiveIntegerField(
+        "В избранном", default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        "В корзинах", default=0, editable=False
+    )
+    # Заполняется триггером PostgreSQL (миграция 0003), GIN-индексы
+    # для полнотекстового и триграммного поиска создаются там же.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ["name"]
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = (
+            # Курсорная пагинация ленты (RecipeViewSet.cursor_ordering)
+            models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"
+            ),
+            # Список рецептов по Meta.ordering с LIMIT/OFFSET
+            models.Index(fields=["name", "id"], name="recipe_name_id_idx"),
+            # Фильтр ?author= и превью рецептов в подписках
+            # (ROW_NUMBER() по автору в порядке Meta.ordering)
+            models.Index(
+                fields=["author", "name"], name="recipe_author_name_idx"
+            ),
+            # ?ordering=-favorites_count
+            models.Index(
+                fields=["-favorites_count", "id"],
+                name="recipe_favorites_count_idx"
+            ),
+        )
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Без этого сохранение рецепта из формы или сериализатора вернуло
+        # бы счетчики, прочитанные вместе с рецептом, затерев изменения,
+        # сделанные за это время. Явный update_fields сохраняется как есть.
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class IngredientInRecipe(models.Model):
     recipe = models.ForeignKey(
@@ -83,6 +140,9 @@ class Favorite(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name="favorites"
     )
+    created_at = models.DateTimeField(
+        "Дата добавления", default=timezone.now, db_index=True
+    )
 
     class Meta:
         verbose_name = "Избранное"
@@ -94,6 +154,11 @@ class Favorite(models.Model):
                 name="unique_user_recipe_favorite"
             )
         ]
+        indexes = (
+            # Избранное пользователя в порядке Meta.ordering и Max(id)
+            # для ETag (api.conditional) без чтения таблицы
+            models.Index(fields=["user", "-id"], name="favorite_user_id_idx"),
+        )
 
     def __str__(self):
         return f"{self.user.username} - {self.recipe.name}"
@@ -102,6 +167,9 @@ class Favorite(models.Model):
 class ShoppingCart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="in_cart")
+    created_at = models.DateTimeField(
+        "Дата добавления", default=timezone.now, db_index=True
+    )
 
     class Meta:
         verbose_name = "Корзина"
@@ -111,6 +179,70 @@ class ShoppingCart(models.Model):
                 fields=["user", "recipe"], name="unique user recipe shopping_cart"
             )
         ]
+        indexes = (
+            # Max(id) корзины пользователя для ETag (api.conditional)
+            models.Index(
+                fields=["user", "-id"], name="shoppingcart_user_id_idx"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.user.username} - {self.recipe.name} (в корзине)"
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в корзине пользователя.
+
+    Поддерживается инкрементально функциями из recipes.shopping_list,
+    пересобирается командой rebuild_shopping_lists.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="shopping_list"
+    )
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    total_amount = models.PositiveIntegerField("Общее количество", default=0)
+
+    class Meta:
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Список покупок"
+        constraints = (
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_user_ingredient_shopping_list"
+            ),
+        )
+
+    def __str__(self):
+        return (
+            f"{self.user.username} - {self.ingredient.name} "
+            f"({self.total_amount})"
+        )
+
+
+class TrendingRecipe(models.Model):
+    """Место рецепта в рейтинге популярности.
+
+    В PostgreSQL это материализованное представление, в остальных СУБД
+    таблица; обе создаются миграцией 0009 и обновляются командой
+    refresh_trending (recipes.trending). Строки удаленных рецептов
+    остаются до следующего обновления.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_constraint=False,
+        related_name="trend",
+    )
+    score = models.FloatField("Популярность")
+    rank = models.PositiveIntegerField("Место")
+
+    class Meta:
+        managed = False
+        db_table = "recipes_trending"
+        ordering = ("rank",)
+        verbose_name = "Популярный рецепт"
+        verbose_name_plural = "Популярные рецепты"
 
     def __str__(self):
-        return f"{self.user.username} - {self.recipe.name} (в корзине)"
\ No newline at end of file
+        return f"{self.rank}. {self.recipe_id}"
@@ -0,0 +1,141 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from recipes.models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def get_recipe_amounts(recipe):
+    return Counter(dict(
+        IngredientInRecipe.objects.filter(recipe=recipe)
+        .values_list('ingredient_id', 'amount')
+    ))
+
+
+@transaction.atomic
+def apply_deltas(user_ids, deltas):
+    """Прибавляет ``deltas`` {ingredient_id: amount} к спискам покупок.
+
+    Одним UPDATE меняет существующие строки, недостающие создает
+    через bulk_create и удаляет строки, сумма которых стала нулевой.
+    """
+    deltas = {pk: amount for pk, amount in deltas.items() if amount}
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    )
+    existing = set(items.values_list('user_id', 'ingredient_id'))
+    items.update(total_amount=Greatest(
+        F('total_amount') + Case(
+            *(When(ingredient_id=pk, then=Value(amount))
+              for pk, amount in deltas.items()),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    ))
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=pk, total_amount=amount
+            )
+            for user_id in user_ids
+            for pk, amount in deltas.items()
+            if amount > 0 and (user_id, pk) not in existing
+        ],
+        batch_size=BATCH_SIZE
+    )
+    ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas, total_amount=0
+    ).delete()
+
+
+def add_recipe(user_id, recipe):
+    apply_deltas([user_id], get_recipe_amounts(recipe))
+
+
+def remove_recipe(user_id, recipe):
+    apply_deltas([user_id], {
+        pk: -amount for pk, amount in get_recipe_amounts(recipe).items()
+    })
+
+
+def apply_recipe_change(recipe, old_amounts, new_amounts):
+    """Переносит изменение состава рецепта в списки покупок.
+
+    Затрагивает всех пользователей, у которых рецепт в корзине.
+    """
+    deltas = Counter(new_amounts)
+    deltas.subtract(old_amounts)
+    apply_deltas(
+        ShoppingCart.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True
+        ),
+        deltas
+    )
+
+
+def get_live_totals(user_ids=None):
+    """Суммы по корзинам, посчитанные заново: {(user_id, ingredient_id)}."""
+    queryset = ShoppingCart.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in queryset.values(
+            'user_id', 'recipe__ingredient_amounts__ingredient_id'
+        ).annotate(
+            total=Sum('recipe__ingredient_amounts__amount')
+        ).order_by().values_list(
+            'user_id', 'recipe__ingredient_amounts__ingredient_id', 'total'
+        ).iterator(chunk_size=BATCH_SIZE)
+        if ingredient_id is not None
+    }
+
+
+def get_stored_totals(user_ids=None):
+    queryset = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in queryset.values_list(
+            'user_id', 'ingredient_id', 'total_amount'
+        ).iterator(chunk_size=BATCH_SIZE)
+    }
+
+
+def find_mismatches(user_ids=None):
+    """Расхождения таблицы с живым агрегатом: {ключ: (в таблице, живое)}."""
+    live = get_live_totals(user_ids)
+    stored = get_stored_totals(user_ids)
+    return {
+        key: (stored.get(key), live.get(key))
+        for key in live.keys() | stored.keys()
+        if live.get(key) != stored.get(key)
+    }
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    totals = get_live_totals(user_ids)
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id,
+                total_amount=total
+            )
+            for (user_id, ingredient_id), total in totals.items()
+        ],
+        batch_size=BATCH_SIZE
+    )
+    return len(totals)
@@ -0,0 +1,59 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes import counters, shopping_list
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+
+def _is_direct_delete(origin, model):
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, raw=False, **kwargs):
+    # При loaddata список покупок загружается из фикстуры вместе с корзиной
+    if created and not raw:
+        shopping_list.add_recipe(instance.user_id, instance.recipe)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, origin=None, **kwargs):
+    # При каскадном удалении рецепта списки пересчитываются одним
+    # вызовом в remove_recipe_from_shopping_lists, а при удалении
+    # пользователя его список удаляется целиком.
+    if _is_direct_delete(origin, ShoppingCart):
+        shopping_list.remove_recipe(instance.user_id, instance.recipe)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    shopping_list.apply_recipe_change(
+        instance, shopping_list.get_recipe_amounts(instance), {}
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, raw=False,
+                             **kwargs):
+    # В фикстуре счетчики уже сохранены вместе с рецептом
+    if created and not raw:
+        counters.change(sender, [instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, origin=None, **kwargs):
+    # При удалении рецепта счетчики удаляются вместе с ним, при
+    # удалении пользователя их уменьшает decrement_user_counters
+    if _is_direct_delete(origin, sender):
+        counters.change(sender, [instance.recipe_id], -1)
+
+
+@receiver(pre_delete, sender=User)
+def decrement_user_counters(sender, instance, **kwargs):
+    counters.remove_user(instance)
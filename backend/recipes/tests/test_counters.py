@@ -0,0 +1,106 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.caching import get_recipes_version
+from api.tests.utils import create_recipe, create_user, get_client
+from recipes import counters
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+class RecipeCountersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.user = create_user('user')
+        cls.other = create_user('other')
+        cls.recipe = create_recipe(cls.author)
+
+    def counts(self, recipe=None):
+        return Recipe.objects.values_list(
+            'favorites_count', 'in_carts_count'
+        ).get(pk=(recipe or self.recipe).pk)
+
+    def test_signals_follow_links(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Favorite.objects.create(user=self.other, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        self.assertEqual(self.counts(), (2, 1))
+        Favorite.objects.get(user=self.other).delete()
+        Favorite.objects.filter(user=self.user).delete()
+        self.assertEqual(self.counts(), (0, 1))
+        self.assertFalse(counters.find_mismatches().exists())
+
+    def test_user_deletion_decrements_counters(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Favorite.objects.create(user=self.other, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        self.user.delete()
+        self.assertEqual(self.counts(), (1, 0))
+        self.assertFalse(counters.find_mismatches().exists())
+
+    def test_counters_do_not_go_negative(self):
+        counters.change(Favorite, [self.recipe.pk], -1)
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_reconcile_fixes_drift(self):
+        other_recipe = create_recipe(self.author, name='Другой')
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            favorites_count=5, in_carts_count=3
+        )
+        self.assertEqual(
+            list(counters.find_mismatches().values_list('pk', flat=True)),
+            [self.recipe.pk]
+        )
+        self.assertEqual(counters.reconcile(), 1)
+        self.assertEqual(self.counts(), (1, 0))
+        self.assertEqual(self.counts(other_recipe), (0, 0))
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_reconcile_command_verify(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(favorites_count=5)
+        call_command(
+            'reconcile_recipe_counters', '--verify', stdout=StringIO()
+        )
+        self.assertEqual(self.counts(), (5, 0))
+        call_command('reconcile_recipe_counters', stdout=StringIO())
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_save_keeps_concurrent_counter_changes(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        recipe.name = 'Новое название'
+        recipe.save()
+        self.assertEqual(self.counts(), (1, 0))
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).name, 'Новое название'
+        )
+
+    def test_save_writes_explicit_counter_fields(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.favorites_count = 7
+        recipe.save(update_fields=['favorites_count'])
+        self.assertEqual(self.counts(), (7, 0))
+
+    def test_cached_response_shows_new_counters(self):
+        cache.clear()
+        anonymous = get_client()
+        url = f'/api/recipes/{self.recipe.pk}/'
+        self.assertEqual(anonymous.get(url).data['favorites_count'], 0)
+        anonymous.get('/api/recipes/')
+        version = get_recipes_version()
+        response = get_client(self.user).post(f'{url}favorite/')
+        self.assertEqual(response.status_code, 201)
+        # Кэш ответов не сбрасывается, счетчики подставляются при чтении
+        self.assertEqual(get_recipes_version(), version)
+        self.assertEqual(anonymous.get(url).data['favorites_count'], 1)
+        self.assertEqual(
+            anonymous.get('/api/recipes/').data['results'][0][
+                'favorites_count'
+            ],
+            1
+        )
@@ -0,0 +1,104 @@
+from django.test import TestCase
+
+from api.tests.utils import (
+    create_ingredients,
+    create_recipe,
+    create_user,
+    get_client,
+)
+from recipes import shopping_list
+from recipes.models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+
+
+class ShoppingListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.other = create_user('other')
+        cls.flour, cls.eggs, cls.milk = create_ingredients(3)
+        cls.pancakes = create_recipe(cls.user, (cls.flour, cls.eggs))
+        cls.cake = create_recipe(cls.user, (cls.flour, cls.milk))
+
+    def totals(self, user):
+        return dict(
+            ShoppingListItem.objects.filter(user=user)
+            .values_list('ingredient_id', 'total_amount')
+        )
+
+    def assertConsistent(self):
+        self.assertEqual(shopping_list.find_mismatches(), {})
+
+    def test_cart_changes_update_totals(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        ShoppingCart.objects.create(user=self.user, recipe=self.cake)
+        self.assertEqual(self.totals(self.user), {
+            self.flour.pk: 20, self.eggs.pk: 10, self.milk.pk: 10
+        })
+        ShoppingCart.objects.get(user=self.user, recipe=self.cake).delete()
+        # Строка с нулевой суммой удаляется
+        self.assertEqual(self.totals(self.user), {
+            self.flour.pk: 10, self.eggs.pk: 10
+        })
+        self.assertConsistent()
+
+    def test_apply_deltas(self):
+        ShoppingListItem.objects.create(
+            user=self.user, ingredient=self.flour, total_amount=5
+        )
+        shopping_list.apply_deltas(
+            [self.user.pk, self.other.pk],
+            {self.flour.pk: 3, self.eggs.pk: 0, self.milk.pk: -2}
+        )
+        # Отрицательная дельта не создает строк, нулевая пропускается
+        self.assertEqual(self.totals(self.user), {self.flour.pk: 8})
+        self.assertEqual(self.totals(self.other), {self.flour.pk: 3})
+        shopping_list.apply_deltas([self.user.pk], {self.flour.pk: -100})
+        self.assertEqual(self.totals(self.user), {})
+
+    def test_apply_deltas_without_users_or_deltas(self):
+        shopping_list.apply_deltas([], {self.flour.pk: 1})
+        shopping_list.apply_deltas([self.user.pk], {self.flour.pk: 0})
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_recipe_update_changes_all_carts(self):
+        for user in (self.user, self.other):
+            ShoppingCart.objects.create(user=user, recipe=self.pancakes)
+        response = get_client(self.user).patch(
+            f'/api/recipes/{self.pancakes.pk}/',
+            {
+                'ingredients': [
+                    {'id': self.flour.pk, 'amount': 40},
+                    {'id': self.milk.pk, 'amount': 15},
+                ],
+                'name': 'Блины', 'text': 'Описание', 'cooking_time': 10,
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        for user in (self.user, self.other):
+            self.assertEqual(self.totals(user), {
+                self.flour.pk: 40, self.milk.pk: 15
+            })
+        self.assertConsistent()
+
+    def test_recipe_delete_changes_carts(self):
+        ShoppingCart.objects.create(user=self.other, recipe=self.pancakes)
+        ShoppingCart.objects.create(user=self.other, recipe=self.cake)
+        self.pancakes.delete()
+        self.assertEqual(self.totals(self.other), {
+            self.flour.pk: 10, self.milk.pk: 10
+        })
+        self.assertConsistent()
+
+    def test_rebuild_fixes_drift(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        IngredientInRecipe.objects.filter(
+            recipe=self.pancakes, ingredient=self.eggs
+        ).update(amount=99)
+        self.assertEqual(
+            shopping_list.find_mismatches(),
+            {(self.user.pk, self.eggs.pk): (10, 99)}
+        )
+        shopping_list.rebuild()
+        self.assertConsistent()
@@ -0,0 +1,55 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes.constants import (
+    TRENDING_CART_WEIGHT,
+    TRENDING_FAVORITE_WEIGHT,
+    TRENDING_HALF_LIFE_HOURS,
+    TRENDING_WINDOW_DAYS,
+)
+from recipes.models import Favorite, ShoppingCart, TrendingRecipe
+
+# Модель добавлений и вес одного добавления в рейтинге
+WEIGHTS = {
+    Favorite: TRENDING_FAVORITE_WEIGHT,
+    ShoppingCart: TRENDING_CART_WEIGHT,
+}
+
+
+def refresh():
+    """Пересчитывает рейтинг популярности (модель TrendingRecipe).
+
+    В PostgreSQL материализованное представление обновляется
+    CONCURRENTLY: чтения не блокируются и видят прежний рейтинг до
+    конца обновления. В остальных СУБД таблица переписывается в одной
+    транзакции по той же формуле, что и в миграции 0009.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'REFRESH MATERIALIZED VIEW CONCURRENTLY '
+                f'{connection.ops.quote_name(TrendingRecipe._meta.db_table)}'
+            )
+        return TrendingRecipe.objects.count()
+
+    now = timezone.now()
+    half_life = TRENDING_HALF_LIFE_HOURS * 3600
+    scores = defaultdict(float)
+    for model, weight in WEIGHTS.items():
+        additions = model.objects.filter(
+            created_at__gte=now - timedelta(days=TRENDING_WINDOW_DAYS)
+        ).values_list('recipe_id', 'created_at')
+        for recipe_id, created_at in additions.iterator():
+            age = (now - created_at).total_seconds()
+            scores[recipe_id] += weight * 0.5 ** (age / half_life)
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    with transaction.atomic():
+        TrendingRecipe.objects.all().delete()
+        TrendingRecipe.objects.bulk_create(
+            TrendingRecipe(recipe_id=recipe_id, score=score, rank=rank)
+            for rank, (recipe_id, score) in enumerate(ranked, start=1)
+        )
+    return len(ranked)
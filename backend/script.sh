@@ -24,6 +24,17 @@ python manage.py load_users
 echo '3. Loading recipes...'
 python manage.py load_recipes
 
+echo 'Ranking trending recipes...'
+python manage.py refresh_trending
+
 echo 'Starting server...'
-gunicorn --bind 0.0.0.0:8000 foodgram_backend.wsgi
+if [ "$ASGI_SERVER" = 'True' ]; then
+    # Асинхронные представления чтения работают только под ASGI
+    export ASYNC_READ_VIEWS="${ASYNC_READ_VIEWS:-True}"
+    gunicorn --bind 0.0.0.0:8000 \
+        --worker-class uvicorn_worker.UvicornWorker \
+        foodgram_backend.asgi:application
+else
+    gunicorn --bind 0.0.0.0:8000 foodgram_backend.wsgi
+fi
 exec "$@"
\ No newline at end of file
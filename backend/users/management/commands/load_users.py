@@ -1,50 +1,120 @@
-import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+import django
 from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from foodgram_backend.loaders import iter_records
+from foodgram_backend.signals import rows_changed
 from users.models import User
 
+DEFAULT_PATH = 'data/users.json'
+FIELDS = ('email', 'username', 'first_name', 'last_name', 'password')
+
+
+def _init_worker():
+    # Процессы, запущенные через spawn, не наследуют настроенный Django
+    django.setup()
+
 
 class Command(BaseCommand):
-    help = 'Load users from data/users.json'
+    help = (
+        'Загрузка пользователей из JSON или JSON Lines; пароли '
+        'хешируются параллельно, пользователи создаются пачками'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument(
+            '--format', choices=('json', 'jsonl'), dest='file_format',
+            help='По умолчанию определяется по расширению файла'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессов для хеширования паролей'
+        )
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1 or options['workers'] < 1:
+            raise CommandError(
+                '--batch-size и --workers должны быть больше нуля'
+            )
+        self.verbosity = options['verbosity']
+        started = time.perf_counter()
+        usernames, emails = set(), set()
+        for username, email in User.objects.values_list(
+            'username', 'email'
+        ).iterator():
+            usernames.add(username)
+            emails.add(email)
+
+        read_count = created_count = 0
+        records = iter_records(options['path'], options['file_format'])
         try:
-            with open('data/users.json', 'r', encoding='utf-8') as file:
-                data = json.load(file)
-            for item in data:
-                    try:
-                        if not User.objects.filter(
-                            username=item['username']
-                        ).exists():
-                            user = User.objects.create(
-                                email=item['email'],
-                                username=item['username'],
-                                first_name=item['first_name'],
-                                last_name=item['last_name'],
-                                password=make_password(item['password'])
-                            )
-                            self.stdout.write(
-                                self.style.SUCCESS(
-                                    f'Successfully created user {user.username}'
-                                )
-                            )
-                        else:
-                            self.stdout.write(
-                                self.style.WARNING(
-                                    f'User {item["username"]} already exists'
-                                )
-                            )
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(
-                                f'Failed to create user {item["username"]}: {e}'
-                            )
-                        )
+            with ProcessPoolExecutor(
+                options['workers'], initializer=_init_worker
+            ) as pool:
+                while batch := list(islice(records, batch_size)):
+                    read_count += len(batch)
+                    users = self._new_users(batch, usernames, emails)
+                    passwords = pool.map(
+                        make_password,
+                        [user.password for user in users],
+                        chunksize=max(len(users) // options['workers'], 1)
+                    )
+                    for user, password in zip(users, passwords):
+                        user.password = password
+                    with transaction.atomic():
+                        User.objects.bulk_create(users)
+                    created_count += len(users)
         except FileNotFoundError:
-            self.stdout.write(
-                self.style.ERROR(
-                    'File data/users.json not found'
-                )
-            ) 
\ No newline at end of file
+            raise CommandError(f'Файл {options["path"]} не найден')
+        except ValueError as error:
+            raise CommandError(
+                f'Некорректный JSON в {options["path"]}: {error}'
+            )
+        if created_count:
+            # bulk_create не отправляет post_save
+            rows_changed.send(sender=User, count_changed=True)
+
+        elapsed = time.perf_counter() - started
+        rate = read_count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created_count} users, skipped '
+            f'{read_count - created_count} of {read_count} records '
+            f'in {elapsed:.2f}s ({rate:.0f} users/s)'
+        ))
+
+    def _new_users(self, batch, usernames, emails):
+        users = []
+        for item in batch:
+            missing = [field for field in FIELDS if not item.get(field)]
+            if missing:
+                self.stdout.write(self.style.ERROR(
+                    f'Failed to create user {item.get("username")}: '
+                    f'missing {", ".join(missing)}'
+                ))
+                continue
+            email = User.objects.normalize_email(item['email'])
+            if item['username'] in usernames or email in emails:
+                if self.verbosity > 1:
+                    self.stdout.write(self.style.WARNING(
+                        f'User {item["username"]} already exists'
+                    ))
+                continue
+            usernames.add(item['username'])
+            emails.add(email)
+            users.append(User(
+                email=email,
+                username=item['username'],
+                first_name=item['first_name'],
+                last_name=item['last_name'],
+                password=item['password']
+            ))
+        return users
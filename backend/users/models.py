@@ -17,6 +17,10 @@ class User(AbstractUser):
         null=True,
         verbose_name='Аватар'
     )
+    # Уменьшенные копии аватара, заполняются в фоне (api.images)
+    avatar_variants = models.JSONField(
+        'Варианты аватара', default=dict, blank=True, editable=False
+    )
     email = models.EmailField(
         'Email',
         max_length=EMAIL_MAX_LENGTH,
@@ -72,6 +76,12 @@ class Subscription(models.Model):
                 name='prevent_self_subscription'
             )
         ]
+        indexes = (
+            # Max(id) подписок пользователя для ETag (api.conditional)
+            models.Index(
+                fields=['user', '-id'], name='subscription_user_id_idx'
+            ),
+        )
 
     def __str__(self):
         return f"{self.user.username} подписан на {self.following.username}"